@@ -1,18 +1,156 @@
 """
 LLM Analyzer
-Analyzes logs using Google Gemini to identify probable causes
+Analyzes logs using Google Gemini or OpenAI to identify probable causes
 """
 
-import json
+import asyncio
+import copy
+import hashlib
+import importlib
 import logging
-from typing import Dict, Any
-from google import genai
-from google.genai import types
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import math
+import random
+import re
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+import orjson
 from config import get_config
 
+if TYPE_CHECKING:
+    from google import genai as genai_sdk
+    from openai import AsyncOpenAI as AsyncOpenAIClient
+
 logger = logging.getLogger(__name__)
 
+# Matches a response wrapped in a markdown code fence (```json ... ``` or ``` ... ```)
+_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*\n?(.*?)\n?\s*```\s*$', re.DOTALL)
+
+# Gemini SDK modules, imported on first use by _load_gemini_sdk()
+# The SDK pulls in grpc/protobuf/pydantic, so importing it at module load
+# would slow down cold starts before the first request is even served.
+genai = None
+types = None
+
+
+def _load_gemini_sdk() -> None:
+    """Import the Gemini SDK modules if they haven't been loaded yet"""
+    global genai, types
+    if genai is None:
+        genai = importlib.import_module("google.genai")
+    if types is None:
+        types = importlib.import_module("google.genai.types")
+
+
+# OpenAI client class, imported on first use by _load_openai_sdk()
+AsyncOpenAI = None
+
+
+def _load_openai_sdk() -> None:
+    """Import the OpenAI SDK if it hasn't been loaded yet"""
+    global AsyncOpenAI
+    if AsyncOpenAI is None:
+        AsyncOpenAI = importlib.import_module("openai").AsyncOpenAI
+
+
+# Shared Gemini client, reused across requests so the underlying HTTP
+# connection pool and TLS sessions survive between analyses
+_gemini_client = None
+_gemini_client_api_key: Optional[str] = None
+
+
+def _get_gemini_client(api_key: str) -> "genai_sdk.Client":
+    """
+    Get the shared Gemini client, creating it on first use
+
+    The client is rebuilt if the API key changes.
+
+    Args:
+        api_key: Gemini API key
+
+    Returns:
+        Gemini client instance
+    """
+    global _gemini_client, _gemini_client_api_key
+    _load_gemini_sdk()
+    if _gemini_client is None or _gemini_client_api_key != api_key:
+        _gemini_client = genai.Client(api_key=api_key)
+        _gemini_client_api_key = api_key
+    return _gemini_client
+
+
+# Shared OpenAI client, reused for the same reason as the Gemini client
+_openai_client = None
+_openai_client_api_key: Optional[str] = None
+
+
+def _get_openai_client(api_key: str) -> "AsyncOpenAIClient":
+    """
+    Get the shared OpenAI client, creating it on first use
+
+    The client is rebuilt if the API key changes.
+
+    Args:
+        api_key: OpenAI API key
+
+    Returns:
+        AsyncOpenAI client instance
+    """
+    global _openai_client, _openai_client_api_key
+    _load_openai_sdk()
+    if _openai_client is None or _openai_client_api_key != api_key:
+        _openai_client = AsyncOpenAI(api_key=api_key)
+        _openai_client_api_key = api_key
+    return _openai_client
+
+
+# Limit on concurrent LLM calls from this process
+# Bursts of analyses (e.g. several /loglens commands at once) queue here
+# instead of all hitting the account rate limit and backing off together.
+# Sized from LLM_MAX_CONCURRENCY on first use (see _get_llm_semaphore).
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_llm_semaphore(config) -> asyncio.Semaphore:
+    """
+    Get the semaphore limiting concurrent LLM calls, creating it on first use
+
+    Args:
+        config: Application config
+
+    Returns:
+        Shared semaphore sized to config.llm_max_concurrency
+    """
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(config.llm_max_concurrency)
+    return _llm_semaphore
+
+
+def preload_llm_sdk() -> None:
+    """
+    Import the configured provider's SDK ahead of the first request
+
+    Intended to run in a background thread at startup so the first analysis
+    doesn't pay the import cost.
+    """
+    if get_config().llm_provider == "openai":
+        _load_openai_sdk()
+    else:
+        _load_gemini_sdk()
+    logger.info("LLM SDK preloaded")
+
+# Gemini model used for analysis
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# OpenAI model used for analysis
+OPENAI_MODEL = "gpt-4o"
+
+# Gemini model used to embed problem descriptions for the semantic cache
+EMBEDDING_MODEL = "text-embedding-004"
+
 # Custom exceptions
 class LLMAnalysisError(Exception):
     """Base exception for LLM analysis errors"""
@@ -23,9 +161,185 @@ class LLMResponseFormatError(LLMAnalysisError):
     pass
 
 class LLMAPIError(LLMAnalysisError):
-    """Raised when Gemini API returns an error"""
+    """Raised when the LLM API returns an error"""
     pass
 
+class LLMCache:
+    """
+    Simple in-memory cache for validated LLM responses
+
+    Key: SHA-256 hash of (model, full prompt)
+    Value: (expiry time, validated response re-serialized as plain JSON)
+
+    Identical analysis requests (retries, duplicate CS tickets) are served
+    from the cache instead of paying for another LLM round trip.
+    """
+
+    def __init__(self, ttl_seconds: float = 7 * 24 * 60 * 60, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[str, Tuple[float, str]] = {}
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        """Generate a deterministic cache key for a model + prompt pair"""
+        return hashlib.sha256((model + "\0" + prompt).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, content = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+
+        return content
+
+    def set(self, key: str, content: str) -> None:
+        """Store a response, evicting the oldest entry when the cache is full"""
+        if key not in self._entries and len(self._entries) >= self.max_entries:
+            oldest_key = next(iter(self._entries))
+            del self._entries[oldest_key]
+
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, content)
+
+    def clear(self) -> None:
+        """Remove all cached responses"""
+        self._entries.clear()
+
+
+# Global LLM response cache
+_llm_cache = LLMCache()
+
+
+class SemanticCache:
+    """
+    In-memory nearest-neighbour cache for paraphrased problem descriptions
+
+    Entries are grouped by an exact-match scope key (customer, 5-minute
+    timestamp bucket and a hash of the knowledge base docs) so that only
+    reports about the same customer and incident window are compared.
+    Within a scope, the description embedding is compared by cosine
+    similarity and a stored analysis is returned above the threshold.
+    """
+
+    def __init__(self, threshold: float = 0.90, max_entries: int = 256, bucket_minutes: int = 5):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bucket_minutes = bucket_minutes
+        # Each entry: (scope key, normalized embedding, validated response data)
+        self._entries: List[Tuple[str, List[float], Dict[str, Any]]] = []
+
+    def make_scope_key(self, customer_id: str, timestamp: str, workflow_docs: str, known_errors: str) -> str:
+        """
+        Build the exact-match part of the key
+
+        The timestamp is bucketed so near-simultaneous reports collide, and the
+        docs are hashed so edits to workflow.md/known_errors.md invalidate entries.
+        """
+        try:
+            parsed = datetime.fromisoformat(timestamp)
+            bucket_minute = parsed.minute - parsed.minute % self.bucket_minutes
+            bucket = parsed.replace(minute=bucket_minute, second=0, microsecond=0).isoformat()
+        except (ValueError, TypeError):
+            bucket = timestamp
+
+        docs_hash = _prompt_digest(_construct_static_prompt(workflow_docs, known_errors))
+        return hashlib.sha256(f"{customer_id}\0{bucket}\0{docs_hash}".encode()).hexdigest()
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> List[float]:
+        """Scale an embedding to unit length so a dot product is cosine similarity"""
+        norm = math.sqrt(sum(value * value for value in embedding))
+        if norm == 0:
+            return list(embedding)
+        return [value / norm for value in embedding]
+
+    def get(self, scope_key: str, embedding: List[float]) -> Optional[Dict[str, Any]]:
+        """Return the closest cached analysis in scope, or None below the threshold"""
+        query = self._normalize(embedding)
+        best_score = -1.0
+        best_response = None
+
+        for entry_scope, entry_embedding, response_data in self._entries:
+            if entry_scope != scope_key or len(entry_embedding) != len(query):
+                continue
+            score = sum(a * b for a, b in zip(query, entry_embedding))
+            if score > best_score:
+                best_score = score
+                best_response = response_data
+
+        if best_response is None or best_score < self.threshold:
+            return None
+
+        return copy.deepcopy(best_response)
+
+    def add(self, scope_key: str, embedding: List[float], response_data: Dict[str, Any]) -> None:
+        """Store a validated analysis, evicting the oldest entry when full"""
+        if len(self._entries) >= self.max_entries:
+            self._entries.pop(0)
+        self._entries.append((scope_key, self._normalize(embedding), copy.deepcopy(response_data)))
+
+    def clear(self) -> None:
+        """Remove all cached analyses"""
+        self._entries.clear()
+
+
+# Global semantic cache (enabled with SEMANTIC_CACHE_ENABLED=true)
+_semantic_cache = SemanticCache()
+
+
+# In-flight LLM calls keyed by LLMCache key (and context cache creations)
+# Concurrent identical requests await the same call instead of each calling the LLM
+_inflight_calls: Dict[str, "asyncio.Task[Any]"] = {}
+
+_T = TypeVar("_T")
+
+
+def _forget_inflight(key: str, task: "asyncio.Task[Any]") -> None:
+    """Done-callback dropping a finished shared call from _inflight_calls"""
+    if _inflight_calls.get(key) is task:
+        del _inflight_calls[key]
+    # Mark the exception retrieved so it isn't reported when every caller left
+    if not task.cancelled():
+        task.exception()
+
+
+async def _singleflight(key: str, call: Callable[[], Awaitable[_T]]) -> _T:
+    """
+    Run call() once for all concurrent callers sharing the same key
+
+    The call runs in its own task, which callers await through
+    asyncio.shield: a caller that is cancelled (e.g. the client disconnected)
+    stops waiting without cancelling the call for everyone else.
+
+    Args:
+        key: Identifies identical requests
+        call: Zero-argument coroutine function making the request
+
+    Returns:
+        Result of the shared call
+    """
+    task = _inflight_calls.get(key)
+    if task is not None:
+        logger.info("Joining in-flight LLM call for key %.16s...", key)
+    else:
+        task = asyncio.ensure_future(call())
+        _inflight_calls[key] = task
+        task.add_done_callback(lambda done: _forget_inflight(key, done))
+    return await asyncio.shield(task)
+
+
+def clear_llm_cache():
+    """Clear the LLM response caches and context cache names (useful for testing)"""
+    _llm_cache.clear()
+    _semantic_cache.clear()
+    _context_caches.clear()
+
+
 # System prompt as per Tech Spec lines 233-252
 SYSTEM_PROMPT = """You are LogLens, a log analysis assistant. Your job is to analyze application
 logs and help identify why a user experienced a problem.
@@ -48,6 +362,91 @@ If logs don't clearly indicate the cause, say so and suggest next steps.
 IMPORTANT: You must respond with valid JSON only, no markdown formatting or code blocks."""
 
 
+# Constant scaffolding of the user prompt, spliced around the dynamic regions
+# by _construct_static_prompt/_construct_request_prompt
+_WORKFLOW_HEADER = "## Workflow Documentation\n"
+_KNOWN_ERRORS_HEADER = "\n\n## Known Error Patterns\n"
+_SENTRY_EVENTS_HEADER = "## Sentry Events\n"
+_DESCRIPTION_LINE = "\n\n## Problem Report\n- Description: "
+_TIMESTAMP_LINE = "\n- Timestamp: "
+_CUSTOMER_ID_LINE = "\n- Customer ID: "
+_RESPONSE_FORMAT = """
+
+Analyze and respond in JSON format (no markdown, just raw JSON):
+{
+  "causes": [{"rank": 1, "cause": "", "explanation": "", "confidence": ""}],
+  "suggested_response": "",
+  "logs_summary": ""
+}"""
+
+
+@lru_cache(maxsize=8)
+def _construct_static_prompt(workflow_docs: str, known_errors: str) -> str:
+    """
+    Construct the knowledge base part of the user prompt
+
+    Memoized because the docs are loaded once per process and passed in as
+    the same string objects on every call, so lookups are cheap identity hits.
+
+    This part only depends on the docs, so it is identical across requests
+    and can be cached server-side (Gemini context caches, OpenAI automatic
+    prefix caching). The response format spec lives here too, so the
+    per-request data is the only thing after the cached prefix.
+
+    Args:
+        workflow_docs: Content from workflow.md
+        known_errors: Content from known_errors.md
+
+    Returns:
+        Formatted knowledge base prompt string
+    """
+    return "".join((
+        _WORKFLOW_HEADER, workflow_docs,
+        _KNOWN_ERRORS_HEADER, known_errors,
+        _RESPONSE_FORMAT,
+    ))
+
+
+@lru_cache(maxsize=8)
+def _prompt_digest(static_prompt: str) -> str:
+    """
+    Hash the static prompt, memoized so the docs aren't rehashed per request
+
+    Args:
+        static_prompt: Knowledge base part of the user prompt
+
+    Returns:
+        Hex SHA-256 digest
+    """
+    return hashlib.sha256(static_prompt.encode()).hexdigest()
+
+
+def _construct_request_prompt(
+    description: str,
+    timestamp: str,
+    customer_id: str,
+    formatted_events: str
+) -> str:
+    """
+    Construct the per-request part of the user prompt
+
+    Args:
+        description: User-provided problem description
+        timestamp: When the issue occurred
+        customer_id: Customer identifier
+        formatted_events: Formatted Sentry events
+
+    Returns:
+        Formatted per-request prompt string
+    """
+    return "".join((
+        _SENTRY_EVENTS_HEADER, formatted_events,
+        _DESCRIPTION_LINE, description,
+        _TIMESTAMP_LINE, timestamp,
+        _CUSTOMER_ID_LINE, customer_id,
+    ))
+
+
 def _construct_user_prompt(
     description: str,
     timestamp: str,
@@ -70,26 +469,90 @@ def _construct_user_prompt(
     Returns:
         Formatted user prompt string
     """
-    return f"""## Workflow Documentation
-{workflow_docs}
+    return "\n\n".join((
+        _construct_static_prompt(workflow_docs, known_errors),
+        _construct_request_prompt(description, timestamp, customer_id, formatted_events),
+    ))
 
-## Known Error Patterns
-{known_errors}
 
-## Sentry Events
-{formatted_events}
+# Explicit Gemini context caches for the static prompt prefix
+# Key: hash of the static prompt (knowledge base docs)
+# Value: (local expiry time, cache name or None if creation failed)
+CONTEXT_CACHE_TTL_SECONDS = 60 * 60
+_context_caches: Dict[str, Tuple[float, Optional[str]]] = {}
 
-## Problem Report
-- Description: {description}
-- Timestamp: {timestamp}
-- Customer ID: {customer_id}
 
-Analyze and respond in JSON format (no markdown, just raw JSON):
-{{
-  "causes": [{{"rank": 1, "cause": "", "explanation": "", "confidence": ""}}],
-  "suggested_response": "",
-  "logs_summary": ""
-}}"""
+async def _get_context_cache(client: "genai_sdk.Client", static_prompt: str) -> Optional[str]:
+    """
+    Get (or create) a Gemini context cache holding the static prompt prefix
+
+    The system prompt and knowledge base docs are pinned server-side so each
+    request only sends the Sentry events and problem report. The cache is keyed
+    on the docs content, so edits to workflow.md/known_errors.md create a new
+    one. Creation failures (e.g. prefix below Gemini's minimum cacheable size)
+    are remembered for the TTL so they are not retried on every request.
+
+    Args:
+        client: Gemini client instance
+        static_prompt: Knowledge base part of the user prompt
+
+    Returns:
+        Cached content name, or None if no cache is available
+    """
+    key = _prompt_digest(static_prompt)
+    now = time.monotonic()
+
+    entry = _context_caches.get(key)
+    if entry is not None and now < entry[0]:
+        return entry[1]
+
+    # Concurrent first requests share one creation instead of each making a cache
+    return await _singleflight(
+        f"context-cache:{key}", lambda: _create_context_cache(client, static_prompt, key)
+    )
+
+
+async def _create_context_cache(
+    client: "genai_sdk.Client", static_prompt: str, key: str
+) -> Optional[str]:
+    """
+    Create a Gemini context cache for the static prompt and remember it
+
+    Args:
+        client: Gemini client instance
+        static_prompt: Knowledge base part of the user prompt
+        key: Digest of static_prompt, keying _context_caches
+
+    Returns:
+        Cached content name, or None if creation failed
+    """
+    _load_gemini_sdk()
+
+    now = time.monotonic()
+    try:
+        cached = await client.aio.caches.create(
+            model=GEMINI_MODEL,
+            config=types.CreateCachedContentConfig(
+                system_instruction=SYSTEM_PROMPT,
+                contents=[static_prompt],
+                ttl=f"{CONTEXT_CACHE_TTL_SECONDS}s",
+            )
+        )
+        name = cached.name
+        logger.info(f"Created Gemini context cache {name}")
+    except Exception as e:
+        logger.warning(f"Failed to create Gemini context cache: {e}")
+        name = None
+
+    # Refresh a minute before the server-side cache expires
+    _context_caches[key] = (now + CONTEXT_CACHE_TTL_SECONDS - 60, name)
+    return name
+
+
+# Required response structure, checked by _validate_llm_response
+_REQUIRED_FIELDS = ("causes", "suggested_response", "logs_summary")
+_CAUSE_REQUIRED_FIELDS = ("rank", "cause", "explanation", "confidence")
+_VALID_CONFIDENCES = frozenset(("high", "medium", "low"))
 
 
 def _validate_llm_response(response_data: Dict[str, Any]) -> None:
@@ -103,14 +566,13 @@ def _validate_llm_response(response_data: Dict[str, Any]) -> None:
         LLMResponseFormatError: If response is missing required fields or has invalid format
     """
     # Check required top-level fields
-    required_fields = ["causes", "suggested_response", "logs_summary"]
-    missing_fields = [field for field in required_fields if field not in response_data]
+    missing_fields = [field for field in _REQUIRED_FIELDS if field not in response_data]
 
     if missing_fields:
         raise LLMResponseFormatError(f"Missing required fields: {missing_fields}")
 
     # Validate causes array
-    causes = response_data.get("causes", [])
+    causes = response_data["causes"]
     if not isinstance(causes, list):
         raise LLMResponseFormatError("'causes' must be an array")
 
@@ -118,43 +580,102 @@ def _validate_llm_response(response_data: Dict[str, Any]) -> None:
         logger.warning(f"Expected 3 causes but got {len(causes)}")
 
     # Validate each cause
-    valid_confidences = {"high", "medium", "low"}
     for i, cause in enumerate(causes):
         if not isinstance(cause, dict):
             raise LLMResponseFormatError(f"Cause {i} must be an object")
 
-        cause_required = ["rank", "cause", "explanation", "confidence"]
-        cause_missing = [field for field in cause_required if field not in cause]
+        cause_missing = [field for field in _CAUSE_REQUIRED_FIELDS if field not in cause]
 
         if cause_missing:
             raise LLMResponseFormatError(f"Cause {i} missing fields: {cause_missing}")
 
         # Validate confidence level
-        confidence = cause.get("confidence", "").lower()
-        if confidence not in valid_confidences:
-            logger.warning(f"Invalid confidence level '{confidence}' in cause {i}, expected one of {valid_confidences}")
+        confidence = cause["confidence"]
+        if not isinstance(confidence, str) or confidence.lower() not in _VALID_CONFIDENCES:
+            logger.warning(f"Invalid confidence level '{confidence}' in cause {i}, expected one of {set(_VALID_CONFIDENCES)}")
 
     # Validate string fields are not empty
-    if not response_data.get("suggested_response", "").strip():
+    suggested_response = response_data["suggested_response"]
+    if not isinstance(suggested_response, str) or not suggested_response.strip():
         raise LLMResponseFormatError("'suggested_response' cannot be empty")
 
-    if not response_data.get("logs_summary", "").strip():
+    logs_summary = response_data["logs_summary"]
+    if not isinstance(logs_summary, str) or not logs_summary.strip():
         raise LLMResponseFormatError("'logs_summary' cannot be empty")
 
 
-@retry(
-    retry=retry_if_exception_type((LLMAPIError,)),
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    reraise=True
-)
-async def _call_gemini_api(client: genai.Client, prompt: str) -> str:
+# Retry policy for Gemini API calls: exponential backoff capped at
+# LLM_RETRY_MAX_WAIT seconds, plus up to LLM_RETRY_JITTER seconds of jitter so
+# concurrent requests that failed together don't retry in lockstep
+LLM_MAX_ATTEMPTS = 3
+LLM_RETRY_MIN_WAIT = 2
+LLM_RETRY_MAX_WAIT = 10
+LLM_RETRY_JITTER = 0.5
+
+# Output token budget. Responses are a small JSON object (three causes and two
+# short text fields), so the cap grows with the amount of log context from a
+# floor that fits a typical answer instead of allowing thousands of tokens
+LLM_MIN_OUTPUT_TOKENS = 800
+LLM_MAX_OUTPUT_TOKENS = 1500
+
+
+def _max_output_tokens(formatted_events: str) -> int:
     """
-    Call Gemini API with retry logic
+    Pick the output token cap for a request
+
+    Args:
+        formatted_events: Formatted Sentry events included in the prompt
+
+    Returns:
+        max_output_tokens to send to Gemini (~4 characters per token)
+    """
+    return min(LLM_MAX_OUTPUT_TOKENS, LLM_MIN_OUTPUT_TOKENS + len(formatted_events) // 4)
+
+
+async def _with_retries(call: Callable[[], Awaitable[str]]) -> str:
+    """
+    Run an LLM API call, retrying LLMAPIError with backoff
+
+    Args:
+        call: Zero-argument coroutine function making one attempt
+
+    Returns:
+        Result of the first successful attempt
+
+    Raises:
+        LLMAPIError: If every attempt fails
+    """
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        try:
+            return await call()
+        except LLMAPIError:
+            if attempt == LLM_MAX_ATTEMPTS - 1:
+                raise
+            delay = min(LLM_RETRY_MAX_WAIT, LLM_RETRY_MIN_WAIT * 2 ** attempt)
+            delay += random.uniform(0, LLM_RETRY_JITTER)
+            logger.warning("LLM API attempt %d failed, retrying in %.1fs", attempt + 1, delay)
+            await asyncio.sleep(delay)
+
+
+async def _call_gemini_api(
+    client: "genai_sdk.Client",
+    prompt: str,
+    cached_content: Optional[str] = None,
+    max_output_tokens: int = LLM_MAX_OUTPUT_TOKENS,
+) -> str:
+    """
+    Call Gemini API with retry logic, streaming the response
+
+    The response is streamed so the first tokens arrive within a few hundred
+    milliseconds instead of after the full generation; chunks are accumulated
+    into the complete response.
 
     Args:
         client: Gemini client instance
-        prompt: Full prompt to send to Gemini
+        prompt: Prompt to send to Gemini (only the per-request part when
+            cached_content is given)
+        cached_content: Optional context cache name holding the static prefix
+        max_output_tokens: Cap on generated tokens
 
     Returns:
         Response content from Gemini
@@ -162,32 +683,75 @@ async def _call_gemini_api(client: genai.Client, prompt: str) -> str:
     Raises:
         LLMAPIError: If API call fails after retries
     """
+    return await _with_retries(
+        lambda: _stream_gemini_response(client, prompt, cached_content, max_output_tokens)
+    )
+
+
+async def _stream_gemini_response(
+    client: "genai_sdk.Client",
+    prompt: str,
+    cached_content: Optional[str],
+    max_output_tokens: int,
+) -> str:
+    """
+    Make a single streamed Gemini API call
+
+    Args:
+        client: Gemini client instance
+        prompt: Prompt to send to Gemini
+        cached_content: Optional context cache name holding the static prefix
+        max_output_tokens: Cap on generated tokens
+
+    Returns:
+        Response content from Gemini
+
+    Raises:
+        LLMAPIError: If the API call fails or returns an empty response
+    """
+    _load_gemini_sdk()
+
     try:
-        logger.info("Calling Gemini API with gemini-2.5-flash")
+        logger.info("Calling Gemini API with %s", GEMINI_MODEL)
 
-        # Generate content using Gemini
-        response = await client.aio.models.generate_content(
-            model='gemini-2.5-flash',
+        # Stream content from Gemini
+        stream = await client.aio.models.generate_content_stream(
+            model=GEMINI_MODEL,
             contents=prompt,
             config=types.GenerateContentConfig(
+                cached_content=cached_content,
                 temperature=0.7,
-                max_output_tokens=8000,
+                max_output_tokens=max_output_tokens,
+                # Constrain output to raw JSON so generation ends when the object closes
+                response_mime_type="application/json",
+                # Thinking tokens count against max_output_tokens; spend the budget on the answer
+                thinking_config=types.ThinkingConfig(thinking_budget=0),
             )
         )
 
+        chunks = []
+        finish_reason = None
+        async for chunk in stream:
+            if chunk.candidates and chunk.candidates[0].finish_reason:
+                finish_reason = chunk.candidates[0].finish_reason
+
+            text = chunk.text
+            if text:
+                chunks.append(text)
+
         # Check if response was completed
-        if response.candidates:
-            finish_reason = response.candidates[0].finish_reason
-            logger.info(f"Response finish reason: {finish_reason}")
-            if finish_reason and finish_reason != 'STOP':
-                logger.warning(f"Response may be incomplete. Finish reason: {finish_reason}")
+        if finish_reason:
+            logger.info("Response finish reason: %s", finish_reason)
+            if finish_reason != 'STOP':
+                logger.warning("Response may be incomplete. Finish reason: %s", finish_reason)
 
-        content = response.text
+        content = "".join(chunks)
         if not content:
             raise LLMAPIError("Empty response from Gemini API")
 
-        logger.info(f"Successfully received response from Gemini ({len(content)} characters)")
-        logger.debug(f"Full response: {content}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Successfully received response from Gemini (%d characters)", len(content))
+        logger.debug("Full response: %s", content)
         return content
 
     except Exception as e:
@@ -195,13 +759,317 @@ async def _call_gemini_api(client: genai.Client, prompt: str) -> str:
         raise LLMAPIError(f"Gemini API call failed: {str(e)}") from e
 
 
+async def _embed_description(client: "genai_sdk.Client", description: str) -> Optional[List[float]]:
+    """
+    Embed a problem description for the semantic cache
+
+    Failures are logged and swallowed - the semantic cache is an optimization
+    and must never fail an analysis.
+
+    Args:
+        client: Gemini client instance
+        description: User-provided problem description
+
+    Returns:
+        Embedding values, or None if embedding failed
+    """
+    try:
+        response = await client.aio.models.embed_content(
+            model=EMBEDDING_MODEL,
+            contents=description,
+        )
+        if response.embeddings and response.embeddings[0].values:
+            return list(response.embeddings[0].values)
+    except Exception as e:
+        logger.warning(f"Failed to embed description for semantic cache: {e}")
+    return None
+
+
+async def _call_openai_api(
+    client: "AsyncOpenAIClient",
+    messages: List[Dict[str, str]],
+    max_tokens: int = LLM_MAX_OUTPUT_TOKENS,
+) -> str:
+    """
+    Call OpenAI API with retry logic, streaming the response
+
+    Streamed for the same reasons as _call_gemini_api.
+
+    Args:
+        client: AsyncOpenAI client instance
+        messages: Chat messages (system + user)
+        max_tokens: Cap on generated tokens
+
+    Returns:
+        Response content from OpenAI
+
+    Raises:
+        LLMAPIError: If API call fails after retries
+    """
+    return await _with_retries(lambda: _stream_openai_response(client, messages, max_tokens))
+
+
+async def _stream_openai_response(
+    client: "AsyncOpenAIClient",
+    messages: List[Dict[str, str]],
+    max_tokens: int,
+    warn_incomplete: bool = True,
+) -> str:
+    """
+    Make a single streamed OpenAI chat completion call
+
+    Args:
+        client: AsyncOpenAI client instance
+        messages: Chat messages (system + user)
+        max_tokens: Cap on generated tokens
+        warn_incomplete: Log a warning if the response was cut short (off for
+            calls that cap max_tokens on purpose)
+
+    Returns:
+        Response content from OpenAI
+
+    Raises:
+        LLMAPIError: If the API call fails or returns an empty response
+    """
+    try:
+        logger.info("Calling OpenAI API with %s", OPENAI_MODEL)
+
+        stream = await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            response_format={"type": "json_object"},
+            temperature=0.7,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+
+        chunks = []
+        finish_reason = None
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+
+            text = choice.delta.content
+            if text:
+                chunks.append(text)
+
+        if warn_incomplete and finish_reason and finish_reason != "stop":
+            logger.warning("Response may be incomplete. Finish reason: %s", finish_reason)
+
+        content = "".join(chunks)
+        if not content:
+            raise LLMAPIError("Empty response from OpenAI API")
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Successfully received response from OpenAI (%d characters)", len(content))
+        logger.debug("Full response: %s", content)
+        return content
+
+    except Exception as e:
+        logger.error(f"OpenAI API error: {str(e)}")
+        raise LLMAPIError(f"OpenAI API call failed: {str(e)}") from e
+
+
+class LLMProvider(ABC):
+    """
+    Strategy for one LLM backend
+
+    analyze_logs builds the prompt, caches, parses and validates the response
+    once for every backend; a provider only sends the prompt to its API.
+    """
+
+    # Model name, part of the response cache key
+    model: str
+
+    @abstractmethod
+    async def generate(
+        self,
+        static_prompt: str,
+        request_prompt: str,
+        max_output_tokens: int,
+    ) -> str:
+        """
+        Get the raw analysis response for a prompt
+
+        Args:
+            static_prompt: Knowledge base part of the user prompt
+            request_prompt: Per-request part of the user prompt
+            max_output_tokens: Cap on generated tokens
+
+        Returns:
+            Raw response content
+
+        Raises:
+            LLMAPIError: If the API call fails after retries
+        """
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        """Embed text for the semantic cache, or None if the provider can't"""
+        return None
+
+    async def warm(self, static_prompt: str) -> None:
+        """Populate the provider-side cache of the static prompt prefix, if any"""
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini backend, with optional context caching of the static prefix"""
+
+    model = GEMINI_MODEL
+
+    def __init__(self, client: "genai_sdk.Client", context_cache_enabled: bool = False):
+        self.client = client
+        self.context_cache_enabled = context_cache_enabled
+
+    async def generate(self, static_prompt, request_prompt, max_output_tokens):
+        # Send only the per-request part when the static prefix is cached server-side
+        context_cache = None
+        if self.context_cache_enabled:
+            context_cache = await _get_context_cache(self.client, static_prompt)
+
+        if context_cache:
+            prompt = request_prompt
+        else:
+            # Gemini doesn't have separate system/user messages in the same way
+            prompt = "\n\n".join((SYSTEM_PROMPT, static_prompt, request_prompt))
+
+        return await _call_gemini_api(
+            self.client, prompt, context_cache,
+            max_output_tokens=max_output_tokens,
+        )
+
+    async def embed(self, text: str) -> Optional[List[float]]:
+        return await _embed_description(self.client, text)
+
+    async def warm(self, static_prompt: str) -> None:
+        if self.context_cache_enabled:
+            await _get_context_cache(self.client, static_prompt)
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI chat completions backend"""
+
+    model = OPENAI_MODEL
+
+    def __init__(self, client: "AsyncOpenAIClient"):
+        self.client = client
+
+    async def generate(self, static_prompt, request_prompt, max_output_tokens):
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": "\n\n".join((static_prompt, request_prompt))},
+        ]
+        return await _call_openai_api(self.client, messages, max_output_tokens)
+
+    async def warm(self, static_prompt: str) -> None:
+        # OpenAI caches prompt prefixes automatically once they've been sent,
+        # so a one-token request with the real prefix is enough
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": "\n\n".join((static_prompt, _WARMUP_REQUEST))},
+        ]
+        await _stream_openai_response(
+            self.client, messages, max_tokens=1, warn_incomplete=False
+        )
+
+
+# Placeholder per-request part sent after the static prefix when warming
+_WARMUP_REQUEST = "## Sentry Events\n"
+
+
+async def warm_prompt_cache(workflow_docs: str, known_errors: str) -> None:
+    """
+    Prime the static prompt caches before the first analysis
+
+    Builds (and memoizes) the static prompt locally and, when
+    LLM_WARM_PROMPT_CACHE=true, has the provider cache it server-side so the
+    first request after a deploy doesn't pay for the full prefix. For Gemini
+    this only does anything when GEMINI_CONTEXT_CACHE_ENABLED is also set.
+    Failures are logged and ignored; the first real request simply starts cold.
+
+    Args:
+        workflow_docs: Content from workflow.md
+        known_errors: Content from known_errors.md
+    """
+    static_prompt = _construct_static_prompt(workflow_docs, known_errors)
+
+    try:
+        config = get_config()
+        if not config.llm_warm_prompt_cache:
+            return
+        await _get_llm_provider(config).warm(static_prompt)
+        logger.info("LLM prompt cache warmed")
+    except Exception as e:
+        logger.warning(f"Failed to warm LLM prompt cache: {e}")
+
+
+def _get_llm_provider(config) -> LLMProvider:
+    """
+    Build the provider selected by LLM_PROVIDER
+
+    Args:
+        config: Application config
+
+    Returns:
+        Provider wrapping a client for the configured API
+    """
+    # Providers are cheap wrappers; the underlying clients are shared
+    if config.llm_provider == "openai":
+        return OpenAIProvider(_get_openai_client(config.openai_api_key))
+    return GeminiProvider(
+        _get_gemini_client(config.gemini_api_key), config.gemini_context_cache_enabled
+    )
+
+
+def _parse_llm_response(response_content: str) -> Dict[str, Any]:
+    """
+    Parse and validate a raw LLM response in one step
+
+    Markdown code fences are stripped, the content is parsed once with orjson
+    and non-object JSON is rejected before the structure is walked.
+
+    Args:
+        response_content: Raw response text from the LLM
+
+    Returns:
+        Validated response data
+
+    Raises:
+        LLMResponseFormatError: If the response is not valid JSON or has an invalid structure
+    """
+    # Clean up response if it has markdown code blocks
+    fence_match = _FENCE_RE.match(response_content)
+    if fence_match:
+        response_content = fence_match.group(1)
+
+    try:
+        response_data = orjson.loads(response_content)
+    except orjson.JSONDecodeError as e:
+        logger.error(f"Failed to parse LLM response as JSON: {e}")
+        logger.error(f"Response content: {response_content[:500]}")
+        raise LLMResponseFormatError(f"Invalid JSON in LLM response: {str(e)}") from e
+
+    try:
+        if not isinstance(response_data, dict):
+            raise LLMResponseFormatError("Response must be a JSON object")
+        _validate_llm_response(response_data)
+    except LLMResponseFormatError:
+        # Log the invalid response for debugging
+        logger.error(f"Invalid LLM response structure: {response_content[:500]}")
+        raise
+
+    return response_data
+
+
 async def analyze_logs(
     description: str,
     timestamp: str,
     customer_id: str,
     formatted_events: str,
     workflow_docs: str,
-    known_errors: str
+    known_errors: str,
 ) -> Dict[str, Any]:
     """
     Analyze logs using LLM to determine probable causes
@@ -223,47 +1091,50 @@ async def analyze_logs(
         LLMAnalysisError: For other analysis errors
     """
     config = get_config()
+    provider = _get_llm_provider(config)
 
-    # Configure Gemini client
-    client = genai.Client(api_key=config.gemini_api_key)
+    logger.info("Analyzing logs for customer %s", customer_id)
 
-    logger.info(f"Analyzing logs for customer {customer_id}")
+    static_prompt = _construct_static_prompt(workflow_docs, known_errors)
+    request_prompt = _construct_request_prompt(description, timestamp, customer_id, formatted_events)
+    full_prompt = "\n\n".join((SYSTEM_PROMPT, static_prompt, request_prompt))
 
-    # Construct full prompt (Gemini doesn't have separate system/user messages in the same way)
-    full_prompt = f"{SYSTEM_PROMPT}\n\n{_construct_user_prompt(description, timestamp, customer_id, formatted_events, workflow_docs, known_errors)}"
+    # Serve identical requests from the cache to skip the LLM round trip
+    cache_key = LLMCache.make_key(provider.model, full_prompt)
+    cached_response = _llm_cache.get(cache_key)
+    if cached_response is not None:
+        logger.info("Using cached LLM response for key %.16s...", cache_key)
+        # Only validated responses are stored, so a hit just needs a fresh parse
+        return orjson.loads(cached_response)
 
-    # Call Gemini API with retry logic
-    try:
-        response_content = await _call_gemini_api(client, full_prompt)
-    except LLMAPIError:
-        # Let retry errors bubble up
-        raise
+    # Check the semantic cache for a paraphrase of an already-analyzed report
+    semantic_key = None
+    embedding = None
+    if config.semantic_cache_enabled:
+        semantic_key = _semantic_cache.make_scope_key(customer_id, timestamp, workflow_docs, known_errors)
+        embedding = await provider.embed(description)
+        if embedding is not None:
+            similar_response = _semantic_cache.get(semantic_key, embedding)
+            if similar_response is not None:
+                logger.info("Using semantically cached LLM response")
+                return similar_response
 
-    # Parse JSON response
-    try:
-        # Clean up response if it has markdown code blocks
-        response_content = response_content.strip()
-        if response_content.startswith("```json"):
-            response_content = response_content[7:]  # Remove ```json
-        if response_content.startswith("```"):
-            response_content = response_content[3:]  # Remove ```
-        if response_content.endswith("```"):
-            response_content = response_content[:-3]  # Remove trailing ```
-        response_content = response_content.strip()
-
-        response_data = json.loads(response_content)
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse LLM response as JSON: {e}")
-        logger.error(f"Response content: {response_content[:500]}")
-        raise LLMResponseFormatError(f"Invalid JSON in LLM response: {str(e)}") from e
+    async def call_llm() -> str:
+        # Call the LLM API with retry logic
+        async with _get_llm_semaphore(config):
+            return await provider.generate(
+                static_prompt, request_prompt,
+                max_output_tokens=_max_output_tokens(formatted_events),
+            )
 
-    # Validate response structure
-    try:
-        _validate_llm_response(response_data)
-    except LLMResponseFormatError:
-        # Log the invalid response for debugging
-        logger.error(f"Invalid LLM response structure: {json.dumps(response_data, indent=2)}")
-        raise
+    # Identical requests already in flight share one LLM call
+    response_content = await _singleflight(cache_key, call_llm)
+    response_data = _parse_llm_response(response_content)
+
+    # Only cache responses that passed validation
+    _llm_cache.set(cache_key, orjson.dumps(response_data).decode())
+    if embedding is not None:
+        _semantic_cache.add(semantic_key, embedding, response_data)
 
     logger.info("Successfully analyzed logs and validated response")
     return response_data
@@ -4,59 +4,129 @@ Loads and validates environment variables
 """
 
 import os
+from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
-from dotenv import load_dotenv
+from typing import Union
 
 # Load environment variables from .env file in the backend directory
 # Use explicit path to ensure we load the correct .env file
 # override=True to ensure .env values take precedence over shell environment
+# The file is parsed once per process tree: worker processes inherit the loaded
+# environment (and the marker), and deployments that inject variables without
+# a .env file never import python-dotenv at all.
+ENV_LOADED_MARKER = "LOGLENS_ENV_LOADED"
 env_path = Path(__file__).parent / '.env'
-load_dotenv(dotenv_path=env_path, override=True)
+if not os.environ.get(ENV_LOADED_MARKER) and env_path.is_file():
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=env_path, override=True)
+    os.environ[ENV_LOADED_MARKER] = "1"
 
 
+# Supported LLM providers and the environment variable holding each API key
+LLM_PROVIDERS = {
+    "gemini": "GEMINI_API_KEY",
+    "openai": "OPENAI_API_KEY",
+}
+
+
+def _env(name: str, default: str = ""):
+    """Build a dataclass field default that reads an environment variable at construction time"""
+    return field(default_factory=lambda: os.getenv(name, default))
+
+
+def _env_number(name: str, default: Union[int, float], minimum: Union[int, float]):
+    """
+    Build a dataclass field default that reads a numeric environment variable
+
+    Args:
+        name: Environment variable name
+        default: Value used when the variable is unset or empty; its type
+            (int or float) decides how the value is parsed
+        minimum: Smallest accepted value
+
+    Returns:
+        Dataclass field whose factory raises ValueError naming the variable if
+        the value can't be parsed or is below minimum
+    """
+    parse_type = type(default)
+    kind = "an integer" if parse_type is int else "a number"
+
+    def parse() -> Union[int, float]:
+        raw = os.getenv(name, "").strip()
+        if not raw:
+            return default
+        try:
+            value = parse_type(raw)
+        except ValueError:
+            value = None
+        if value is None or not value >= minimum:
+            raise ValueError(f"{name} must be {kind} >= {minimum}, got '{raw}'")
+        return value
+
+    return field(default_factory=parse)
+
+
+def _env_flag(name: str):
+    """Build a dataclass field default for an opt-in environment flag (enabled by "true")"""
+    return field(default_factory=lambda: os.getenv(name, "false").lower() == "true")
+
+
+@dataclass(frozen=True, slots=True)
 class Config:
     """Application configuration loaded from environment variables"""
 
     # Sentry Configuration
-    sentry_auth_token: str
-    sentry_org: str
-    sentry_project: str
-
-    # Gemini Configuration
-    gemini_api_key: str
+    sentry_auth_token: str = _env("SENTRY_AUTH_TOKEN")
+    sentry_org: str = _env("SENTRY_ORG")
+    sentry_project: str = _env("SENTRY_PROJECT")
+
+    # LLM Configuration
+    # llm_provider selects the analysis backend: "gemini" or "openai"
+    llm_provider: str = _env("LLM_PROVIDER", "gemini")
+    gemini_api_key: str = _env("GEMINI_API_KEY")
+    openai_api_key: str = _env("OPENAI_API_KEY")
+    # Serve paraphrased reports from earlier analyses (costs an embedding call per request)
+    semantic_cache_enabled: bool = _env_flag("SEMANTIC_CACHE_ENABLED")
+    # Pin the system prompt and knowledge base in a Gemini context cache
+    gemini_context_cache_enabled: bool = _env_flag("GEMINI_CONTEXT_CACHE_ENABLED")
+    # Limit on concurrent LLM calls from this process
+    llm_max_concurrency: int = _env_number("LLM_MAX_CONCURRENCY", 8, minimum=1)
+    # Have the provider cache the static prompt prefix at startup
+    llm_warm_prompt_cache: bool = _env_flag("LLM_WARM_PROMPT_CACHE")
+
+    # Sentry Cache
+    # Events for an old incident won't change, but a window that ended within
+    # the last hour can still receive new events, so it's cached only briefly
+    sentry_cache_ttl_seconds: float = _env_number("SENTRY_CACHE_TTL_SECONDS", 300.0, minimum=0)
+    sentry_cache_recent_ttl_seconds: float = _env_number("SENTRY_CACHE_RECENT_TTL_SECONDS", 30.0, minimum=0)
+    # Serve nearby lookups from one wider cached query (see sentry_client)
+    sentry_window_batching_enabled: bool = _env_flag("SENTRY_WINDOW_BATCHING_ENABLED")
 
     # Slack Configuration
-    slack_bot_token: str
-    slack_signing_secret: str
+    slack_bot_token: str = _env("SLACK_BOT_TOKEN")
+    slack_signing_secret: str = _env("SLACK_SIGNING_SECRET")
 
     # Application Security
-    app_password: str
-    allowed_origins: str
-
-    def __init__(self):
-        """Load and validate all required environment variables"""
-        self._load_config()
-        self._validate_config()
-
-    def _load_config(self):
-        """Load all environment variables"""
-        self.sentry_auth_token = os.getenv("SENTRY_AUTH_TOKEN", "")
-        self.sentry_org = os.getenv("SENTRY_ORG", "")
-        self.sentry_project = os.getenv("SENTRY_PROJECT", "")
-        self.gemini_api_key = os.getenv("GEMINI_API_KEY", "")
-        self.slack_bot_token = os.getenv("SLACK_BOT_TOKEN", "")
-        self.slack_signing_secret = os.getenv("SLACK_SIGNING_SECRET", "")
-        self.app_password = os.getenv("APP_PASSWORD", "")
-        self.allowed_origins = os.getenv("ALLOWED_ORIGINS", "*")
-
-    def _validate_config(self):
+    app_password: str = _env("APP_PASSWORD")
+    allowed_origins: str = _env("ALLOWED_ORIGINS", "*")
+
+    def __post_init__(self):
         """Validate that all required environment variables are set"""
+        if self.llm_provider not in LLM_PROVIDERS:
+            raise ValueError(
+                f"Unsupported LLM_PROVIDER '{self.llm_provider}', "
+                f"expected one of: {', '.join(LLM_PROVIDERS)}"
+            )
+
+        # Only the selected provider's API key is required
+        api_key = self.openai_api_key if self.llm_provider == "openai" else self.gemini_api_key
+
         required_vars = {
             "SENTRY_AUTH_TOKEN": self.sentry_auth_token,
             "SENTRY_ORG": self.sentry_org,
             "SENTRY_PROJECT": self.sentry_project,
-            "GEMINI_API_KEY": self.gemini_api_key,
+            LLM_PROVIDERS[self.llm_provider]: api_key,
             "SLACK_BOT_TOKEN": self.slack_bot_token,
             "SLACK_SIGNING_SECRET": self.slack_signing_secret,
             "APP_PASSWORD": self.app_password,
@@ -71,13 +141,12 @@ class Config:
             )
 
 
-# Global config instance - loaded lazily to avoid import errors in tests
-config = None
-
-
+@lru_cache(maxsize=1)
 def get_config() -> Config:
-    """Get or create the global config instance"""
-    global config
-    if config is None:
-        config = Config()
-    return config
+    """
+    Get the application config, loading it from the environment on first use
+
+    Loaded lazily to avoid import errors in tests. Call get_config.cache_clear()
+    to force a reload after the environment changes.
+    """
+    return Config()
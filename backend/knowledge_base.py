@@ -0,0 +1,36 @@
+"""
+Knowledge Base
+Loads the workflow and known-error docs shared by the web and Slack handlers
+"""
+
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "docs")
+
+
+def read_doc(filename: str, default: str) -> str:
+    """
+    Read a knowledge base file from DOCS_DIR
+
+    Args:
+        filename: File name inside DOCS_DIR
+        default: Text to use if the file is missing
+
+    Returns:
+        File contents, or default if the file doesn't exist
+    """
+    path = os.path.join(DOCS_DIR, filename)
+    try:
+        with open(path, "r") as f:
+            return f.read()
+    except FileNotFoundError:
+        logger.warning(f"Knowledge base file not found at {path}")
+        return default
+
+
+# Read once at import (the docs don't change at runtime)
+WORKFLOW_DOCS = read_doc("workflow.md", "No workflow documentation available.")
+KNOWN_ERRORS_DOCS = read_doc("known_errors.md", "No known error patterns available.")
@@ -3,19 +3,36 @@ LogLens Backend API
 FastAPI application for analyzing customer support logs
 """
 
+import asyncio
+import hmac
 import logging
-import json
 import os
 import re
 import time
-from datetime import datetime
+from itertools import count
+from datetime import datetime, timezone
 from typing import Callable
+from urllib.parse import parse_qsl
+import orjson
 from fastapi import FastAPI, Request, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel, Field, field_validator, ValidationError
 from config import get_config
+from knowledge_base import WORKFLOW_DOCS, KNOWN_ERRORS_DOCS
+# Modules are imported whole and their functions looked up at call time,
+# so tests can patch e.g. sentry_client.fetch_sentry_events
+import analyzer
+import sentry_client
+import slack_bot
+from analyzer import LLMAnalysisError, LLMResponseFormatError, LLMAPIError
+from sentry_client import SentryAuthError, SentryRateLimitError, SentryAPIError
+from slack_bot import SlackSignatureVerificationError
+
+
+# Sentinel for optional log record attributes
+_MISSING = object()
 
 
 # Logging Configuration
@@ -25,27 +42,75 @@ class StructuredFormatter(logging.Formatter):
     and human-readable logs for development.
     """
 
-    # Patterns to redact sensitive data
-    SENSITIVE_PATTERNS = [
-        # Bearer tokens must be first to catch "Authorization: Bearer xyz"
-        (re.compile(r'Bearer\s+([^\s,\"\'}]+)', re.IGNORECASE), r'Bearer ***REDACTED***'),
+    # Single pattern matching every kind of sensitive data, so each message is
+    # scanned once. The group that matched selects the replacement.
+    SENSITIVE_PATTERN = re.compile(
+        # Bearer tokens, e.g. "Bearer xyz"
+        r'(?P<bearer>(?i:Bearer)\s+[^\s,\"\'}]+)'
         # API keys, tokens, passwords in key=value or key: value format
-        (re.compile(r'(token|password|secret|key|authorization)[\"\']?\s*[:=]\s*[\"\']?([^\s,\"\'}]+)', re.IGNORECASE), r'\1=***REDACTED***'),
+        # (including "Authorization: Bearer xyz")
+        r'|(?P<kv>(?P<kv_name>(?i:token|password|secret|key|authorization))[\"\']?\s*[:=]\s*[\"\']?'
+        r'(?:(?i:Bearer)\s+)?[^\s,\"\'}]+)'
         # Specific token formats
-        (re.compile(r'sk-[a-zA-Z0-9]{20,}'), r'sk-***REDACTED***'),  # OpenAI API keys
-        (re.compile(r'xoxb-[a-zA-Z0-9-]+'), r'xoxb-***REDACTED***'),  # Slack bot tokens
-        (re.compile(r'sntrys_[a-zA-Z0-9]+'), r'sntrys_***REDACTED***'),  # Sentry tokens
-    ]
+        r'|(?P<openai>sk-[a-zA-Z0-9]{20,})'  # OpenAI API keys
+        r'|(?P<slack>xoxb-[a-zA-Z0-9-]+)'  # Slack bot tokens
+        r'|(?P<sentry>sntrys_[a-zA-Z0-9]+)'  # Sentry tokens
+    )
+
+    # Replacement for each SENSITIVE_PATTERN group (kv keeps its key name)
+    REDACTIONS = {
+        "bearer": "Bearer ***REDACTED***",
+        "openai": "sk-***REDACTED***",
+        "slack": "xoxb-***REDACTED***",
+        "sentry": "sntrys_***REDACTED***",
+    }
+
+    # Substrings (lowercase) that every SENSITIVE_PATTERN match contains;
+    # messages without any of them skip the regex entirely
+    REDACTION_TRIGGERS = ("bearer", "token", "password", "secret", "key", "authorization", "sk-", "xoxb-", "sntrys_")
+
+    # Optional fields passed via logger extra= that are copied into JSON logs
+    EXTRA_FIELDS = ("request_id", "duration_ms", "status_code", "path")
 
     def __init__(self, use_json: bool = False):
         super().__init__()
         self.use_json = use_json
+        # (second, formatted prefix) of the last timestamp, reused for records
+        # logged within the same second
+        self._utc_cache = (None, "")
+        self._local_cache = (None, "")
+
+    def _utc_timestamp(self, created: float) -> str:
+        """Format a record time as UTC ISO 8601 with milliseconds"""
+        second = int(created)
+        cached_second, prefix = self._utc_cache
+        if cached_second != second:
+            prefix = datetime.fromtimestamp(second, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+            self._utc_cache = (second, prefix)
+        return f"{prefix}.{int((created - second) * 1000):03d}Z"
+
+    def _local_timestamp(self, created: float) -> str:
+        """Format a record time as local time with seconds resolution"""
+        second = int(created)
+        cached_second, prefix = self._local_cache
+        if cached_second != second:
+            prefix = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+            self._local_cache = (second, prefix)
+        return prefix
+
+    @classmethod
+    def _redact_match(cls, match: re.Match) -> str:
+        """Return the redacted replacement for a SENSITIVE_PATTERN match"""
+        if match.lastgroup == "kv":
+            return f"{match.group('kv_name')}=***REDACTED***"
+        return cls.REDACTIONS[match.lastgroup]
 
     def redact_sensitive_data(self, message: str) -> str:
         """Redact sensitive information from log messages"""
-        for pattern, replacement in self.SENSITIVE_PATTERNS:
-            message = pattern.sub(replacement, message)
-        return message
+        lowered = message.lower()
+        if not any(trigger in lowered for trigger in self.REDACTION_TRIGGERS):
+            return message
+        return self.SENSITIVE_PATTERN.sub(self._redact_match, message)
 
     def format(self, record: logging.LogRecord) -> str:
         """Format log record as JSON or human-readable text"""
@@ -55,7 +120,7 @@ class StructuredFormatter(logging.Formatter):
         if self.use_json:
             # Structured JSON format for production (Railway)
             log_data = {
-                "timestamp": self.formatTime(record, "%Y-%m-%dT%H:%M:%S.%fZ"),
+                "timestamp": self._utc_timestamp(record.created),
                 "level": record.levelname,
                 "logger": record.name,
                 "message": message,
@@ -69,19 +134,15 @@ class StructuredFormatter(logging.Formatter):
                 log_data["exception"] = self.formatException(record.exc_info)
 
             # Add extra fields if present
-            if hasattr(record, "request_id"):
-                log_data["request_id"] = record.request_id
-            if hasattr(record, "duration_ms"):
-                log_data["duration_ms"] = record.duration_ms
-            if hasattr(record, "status_code"):
-                log_data["status_code"] = record.status_code
-            if hasattr(record, "path"):
-                log_data["path"] = record.path
-
-            return json.dumps(log_data)
+            for field in self.EXTRA_FIELDS:
+                value = getattr(record, field, _MISSING)
+                if value is not _MISSING:
+                    log_data[field] = value
+
+            return orjson.dumps(log_data).decode()
         else:
             # Human-readable format for development
-            timestamp = self.formatTime(record, "%Y-%m-%d %H:%M:%S")
+            timestamp = self._local_timestamp(record.created)
             return f"{timestamp} - {record.name} - {record.levelname} - {message}"
 
 
@@ -97,8 +158,9 @@ def setup_logging():
     log_level = os.getenv("LOG_LEVEL", "INFO").upper()
 
     # Configure root logger
+    level = getattr(logging, log_level, logging.INFO)
     root_logger = logging.getLogger()
-    root_logger.setLevel(getattr(logging, log_level, logging.INFO))
+    root_logger.setLevel(level)
 
     # Remove existing handlers
     for handler in root_logger.handlers[:]:
@@ -106,6 +168,9 @@ def setup_logging():
 
     # Create console handler with appropriate formatter
     console_handler = logging.StreamHandler()
+    # Records from loggers with a lower level of their own still propagate here;
+    # the handler level drops them before any redaction/formatting work
+    console_handler.setLevel(level)
     console_handler.setFormatter(StructuredFormatter(use_json=is_production))
     root_logger.addHandler(console_handler)
 
@@ -118,31 +183,83 @@ def setup_logging():
 # Initialize logging
 logger = setup_logging()
 
+
 app = FastAPI(
     title="LogLens API",
     description="AI-powered log analysis for customer support",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=ORJSONResponse,
 )
 
 # Load config on startup (only in production, tests will mock this)
 try:
     config = get_config()
-    allowed_origins = config.allowed_origins.split(",")
+    # Parsed once into a tuple; whitespace around entries and empty entries are ignored
+    allowed_origins = tuple(
+        origin for origin in (o.strip() for o in config.allowed_origins.split(",")) if origin
+    ) or ("*",)
 except ValueError:
     # In development/testing without full env vars, allow all origins
-    allowed_origins = ["*"]
+    allowed_origins = ("*",)
 
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
     allow_origins=allowed_origins,
+    # With "*" and allow_credentials, Starlette echoes the request's Origin back
+    # instead of sending a literal "*", so credentialed browser requests still work
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Background work (startup preloading, Slack commands being processed). The
+# event loop only keeps weak references to tasks, so they're held here until
+# they finish.
+_background_tasks: set[asyncio.Task] = set()
+
+
+@app.on_event("startup")
+async def preload_llm_sdk():
+    """
+    Import the LLM SDK in a background thread at startup.
+
+    The analyzer imports its SDK lazily; preloading it here removes that cost
+    from the first request without delaying startup readiness. The prompt
+    cache is warmed afterwards (a no-op unless LLM_WARM_PROMPT_CACHE=true).
+    """
+    async def _preload():
+        try:
+            await asyncio.to_thread(analyzer.preload_llm_sdk)
+        except Exception as e:
+            logger.warning(f"Failed to preload LLM SDK: {e}")
+            return
+        await analyzer.warm_prompt_cache(WORKFLOW_DOCS, KNOWN_ERRORS_DOCS)
+
+    task = asyncio.create_task(_preload())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+@app.on_event("shutdown")
+async def close_http_clients():
+    """Close pooled outbound HTTP connections on shutdown"""
+    await sentry_client.close_sentry_client()
+    await slack_bot.close_slack_client()
+
 
 # Request/Response Logging Middleware
+
+# Request IDs are "<process start>-<sequence>": unique within the process even
+# for requests arriving in the same millisecond, and across restarts
+_REQUEST_ID_PREFIX = f"{time.time_ns() // 1_000_000:x}"
+_request_counter = count(1)
+
+# Endpoints polled constantly by the platform (Railway health probes);
+# only logged when LOG_LEVEL=DEBUG
+_QUIET_PATHS = frozenset({"/health"})
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next: Callable):
     """
@@ -151,18 +268,25 @@ async def log_requests(request: Request, call_next: Callable):
     Logs request method, path, and response status code with timing information.
     Sensitive data in headers is automatically redacted by the StructuredFormatter.
     """
-    start_time = time.time()
+    # Read once: request.url builds a URL object on every access
+    path = request.url.path
+    method = request.method
 
-    # Generate a simple request ID for tracking
-    request_id = f"{int(start_time * 1000)}"
+    if path in _QUIET_PATHS and not logger.isEnabledFor(logging.DEBUG):
+        return await call_next(request)
+
+    start_time = time.perf_counter()
+
+    # Generate a unique request ID for tracking
+    request_id = f"{_REQUEST_ID_PREFIX}-{next(_request_counter)}"
 
     # Log incoming request
     logger.info(
-        f"Request: {request.method} {request.url.path}",
+        "Request: %s %s", method, path,
         extra={
             "request_id": request_id,
-            "path": request.url.path,
-            "method": request.method,
+            "path": path,
+            "method": method,
         }
     )
 
@@ -171,12 +295,12 @@ async def log_requests(request: Request, call_next: Callable):
         response = await call_next(request)
     except Exception as e:
         # Log exception and re-raise
-        duration_ms = (time.time() - start_time) * 1000
+        duration_ms = (time.perf_counter() - start_time) * 1000
         logger.error(
-            f"Request failed: {request.method} {request.url.path}",
+            "Request failed: %s %s", method, path,
             extra={
                 "request_id": request_id,
-                "path": request.url.path,
+                "path": path,
                 "duration_ms": duration_ms,
             },
             exc_info=True
@@ -184,14 +308,14 @@ async def log_requests(request: Request, call_next: Callable):
         raise
 
     # Calculate duration
-    duration_ms = (time.time() - start_time) * 1000
+    duration_ms = (time.perf_counter() - start_time) * 1000
 
     # Log response
     logger.info(
-        f"Response: {request.method} {request.url.path} - {response.status_code}",
+        "Response: %s %s - %s", method, path, response.status_code,
         extra={
             "request_id": request_id,
-            "path": request.url.path,
+            "path": path,
             "status_code": response.status_code,
             "duration_ms": duration_ms,
         }
@@ -209,11 +333,13 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
     Logs the full error server-side but returns safe, user-friendly messages.
     """
+    errors = exc.errors()
+
     # Log full error details server-side
-    logger.warning(f"Validation error on {request.url.path}: {exc.errors()}")
+    logger.warning("Validation error on %s: %s", request.url.path, errors)
 
     # Extract first error for user-friendly message
-    first_error = exc.errors()[0] if exc.errors() else {}
+    first_error = errors[0] if errors else {}
     field = first_error.get('loc', ['unknown'])[-1]
     msg = first_error.get('msg', 'Invalid input')
 
@@ -229,7 +355,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     elif field == 'description':
         suggestion = "Description must not be empty"
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
         content={
             "success": False,
@@ -248,9 +374,9 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     """
     # Log the error (use different levels based on status code)
     if exc.status_code >= 500:
-        logger.error(f"HTTP {exc.status_code} on {request.url.path}: {exc.detail}")
+        logger.error("HTTP %s on %s: %s", exc.status_code, request.url.path, exc.detail)
     else:
-        logger.warning(f"HTTP {exc.status_code} on {request.url.path}: {exc.detail}")
+        logger.warning("HTTP %s on %s: %s", exc.status_code, request.url.path, exc.detail)
 
     # Build error response based on status code
     error_msg = exc.detail if isinstance(exc.detail, str) else str(exc.detail)
@@ -266,7 +392,7 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         error_msg = "An internal error occurred"
         suggestion = "Please try again later or contact support if the issue persists"
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content={
             "success": False,
@@ -285,10 +411,10 @@ async def internal_server_error_handler(request: Request, exc: Exception):
     or internal details to clients.
     """
     # Log full error server-side (includes stack trace)
-    logger.error(f"Internal server error on {request.url.path}: {exc}", exc_info=True)
+    logger.error("Internal server error on %s: %s", request.url.path, exc, exc_info=True)
 
     # Return safe, generic error message to client
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "success": False,
@@ -307,10 +433,10 @@ async def global_exception_handler(request: Request, exc: Exception):
     or internal details to clients.
     """
     # Log full error server-side (includes stack trace)
-    logger.error(f"Unhandled exception on {request.url.path}: {exc}", exc_info=True)
+    logger.error("Unhandled exception on %s: %s", request.url.path, exc, exc_info=True)
 
     # Return safe, generic error message to client
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         content={
             "success": False,
@@ -334,7 +460,7 @@ class AnalyzeRequest(BaseModel):
     def validate_timestamp(cls, v: str) -> str:
         """Validate that timestamp is a valid ISO 8601 datetime"""
         try:
-            datetime.fromisoformat(v.replace('Z', '+00:00'))
+            datetime.fromisoformat(v)
         except ValueError:
             raise ValueError("timestamp must be a valid ISO 8601 datetime string")
         return v
@@ -393,9 +519,7 @@ async def verify_auth(request: Request):
     """
     token = request.headers.get("X-Auth-Token")
 
-    # Get the app password from config (reload to pick up env changes in tests)
-    import config as config_module
-    config_module.config = None  # Reset to force reload
+    # Get the app password from config
     try:
         app_config = get_config()
         expected_password = app_config.app_password
@@ -403,8 +527,9 @@ async def verify_auth(request: Request):
         # Config not available (e.g., in tests), raise unauthorized
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-    # Verify token matches password
-    if not token or token != expected_password:
+    # Verify token matches password (constant-time; encoded because
+    # compare_digest rejects non-ASCII str)
+    if not token or not hmac.compare_digest(token.encode(), expected_password.encode()):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 
@@ -424,7 +549,6 @@ async def debug_config():
     """
     Debug endpoint to check config values (remove in production!)
     """
-    import os
     return {
         "app_password_length": len(os.getenv("APP_PASSWORD", "")),
         "app_password_first_char": os.getenv("APP_PASSWORD", "")[0] if os.getenv("APP_PASSWORD") else None,
@@ -437,7 +561,6 @@ async def debug_auth(request: Request):
     """
     Debug endpoint to check auth header (remove in production!)
     """
-    import os
     token = request.headers.get("X-Auth-Token")
     expected = os.getenv("APP_PASSWORD", "")
     return {
@@ -497,19 +620,9 @@ async def analyze(
     # Verify authentication
     await verify_auth(request)
 
-    # Import Sentry client functions
-    from sentry_client import (
-        fetch_sentry_events,
-        format_events_for_llm,
-        generate_sentry_link,
-        SentryAuthError,
-        SentryRateLimitError,
-        SentryAPIError,
-    )
-
     # Fetch Sentry events for the customer
     try:
-        events = await fetch_sentry_events(
+        events = await sentry_client.fetch_sentry_events(
             customer_id=analyze_request.customer_id,
             timestamp=analyze_request.timestamp,
             time_window_minutes=5,
@@ -538,47 +651,20 @@ async def analyze(
         events = []
 
     # Generate Sentry links for all events
-    sentry_links = []
-    if events:
-        for event in events:
-            event_id = event.get("id")
-            if event_id:
-                sentry_links.append(generate_sentry_link(event_id))
+    sentry_links = sentry_client.generate_sentry_links(events)
 
     # Format events for LLM
-    logs_summary = format_events_for_llm(events)
-
-    # Import analyzer functions
-    from analyzer import analyze_logs, LLMAnalysisError, LLMResponseFormatError, LLMAPIError
-    import os
-
-    # Load knowledge base files
-    workflow_path = os.path.join(os.path.dirname(__file__), "docs", "workflow.md")
-    known_errors_path = os.path.join(os.path.dirname(__file__), "docs", "known_errors.md")
-
-    try:
-        with open(workflow_path, "r") as f:
-            workflow_docs = f.read()
-    except FileNotFoundError:
-        logger.warning(f"Workflow documentation not found at {workflow_path}")
-        workflow_docs = "No workflow documentation available."
-
-    try:
-        with open(known_errors_path, "r") as f:
-            known_errors = f.read()
-    except FileNotFoundError:
-        logger.warning(f"Known errors documentation not found at {known_errors_path}")
-        known_errors = "No known error patterns available."
+    logs_summary = sentry_client.format_events_for_llm(events)
 
     # Call LLM analyzer
     try:
-        llm_response = await analyze_logs(
+        llm_response = await analyzer.analyze_logs(
             description=analyze_request.description,
             timestamp=analyze_request.timestamp,
             customer_id=analyze_request.customer_id,
             formatted_events=logs_summary,
-            workflow_docs=workflow_docs,
-            known_errors=known_errors
+            workflow_docs=WORKFLOW_DOCS,
+            known_errors=KNOWN_ERRORS_DOCS
         )
     except LLMResponseFormatError as e:
         # LLM returned invalid format - return error
@@ -610,14 +696,7 @@ async def analyze(
         )
 
     # Parse causes from LLM response
-    causes = []
-    for cause_data in llm_response.get("causes", []):
-        causes.append(Cause(
-            rank=cause_data.get("rank"),
-            cause=cause_data.get("cause"),
-            explanation=cause_data.get("explanation"),
-            confidence=cause_data.get("confidence")
-        ))
+    causes = [Cause.model_validate(cause_data) for cause_data in llm_response.get("causes", ())]
 
     # Return structured response with LLM analysis and Sentry links
     return AnalyzeResponse(
@@ -637,28 +716,23 @@ async def _process_slack_command_async(command_text: str, response_url: str):
     This allows us to respond to Slack immediately (avoiding 3-second timeout)
     while processing the actual request asynchronously.
     """
-    from slack_bot import handle_slack_command, format_slack_error
-    import httpx
-
     try:
         # Process the command (this may take 20-30 seconds)
-        response = await handle_slack_command(command_text)
+        response = await slack_bot.handle_slack_command(command_text)
 
         # Post the result back to Slack using response_url
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            await client.post(response_url, json=response)
-            logger.info("Successfully posted response to Slack")
+        await slack_bot.post_to_response_url(response_url, response)
+        logger.info("Successfully posted response to Slack")
 
     except Exception as e:
         logger.error(f"Error processing Slack command in background: {e}", exc_info=True)
         # Post error message to Slack
-        error_response = format_slack_error(
+        error_response = slack_bot.format_slack_error(
             "An error occurred while processing your request",
             "Please try again or contact support if the issue persists"
         )
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                await client.post(response_url, json=error_response)
+            await slack_bot.post_to_response_url(response_url, error_response, timeout=10.0)
         except Exception as post_error:
             logger.error(f"Failed to post error to Slack: {post_error}")
 
@@ -681,14 +755,6 @@ async def slack_commands(request: Request):
         HTTPException: 401 if signature verification fails
         HTTPException: 400 if command format is invalid
     """
-    # Import Slack bot functions
-    from slack_bot import (
-        verify_slack_signature,
-        handle_slack_command,
-        format_slack_error,
-        SlackSignatureVerificationError
-    )
-
     # Get Slack signature headers
     timestamp = request.headers.get("X-Slack-Request-Timestamp")
     signature = request.headers.get("X-Slack-Signature")
@@ -704,8 +770,6 @@ async def slack_commands(request: Request):
     body = await request.body()
 
     # Get signing secret from config
-    import config as config_module
-    config_module.config = None  # Reset to force reload
     try:
         slack_config = get_config()
         signing_secret = slack_config.slack_signing_secret
@@ -718,7 +782,7 @@ async def slack_commands(request: Request):
 
     # Verify Slack signature
     try:
-        verify_slack_signature(body, timestamp, signature, signing_secret)
+        slack_bot.verify_slack_signature(body, timestamp, signature, signing_secret)
     except SlackSignatureVerificationError as e:
         logger.warning(f"Slack signature verification failed: {e}")
         raise HTTPException(
@@ -726,20 +790,19 @@ async def slack_commands(request: Request):
             detail="Invalid signature"
         )
 
-    # Parse form data from Slack
-    from urllib.parse import parse_qs
-    form_data = parse_qs(body.decode('utf-8'))
-
-    # Extract command text and response URL
-    command_text = form_data.get('text', [''])[0]
-    response_url = form_data.get('response_url', [''])[0]
+    # Extract command text and response URL from the Slack form data
+    # (reversed so the first occurrence of a repeated key wins)
+    fields = dict(reversed(parse_qsl(body.decode('utf-8'), keep_blank_values=True)))
+    command_text = fields.get('text', '')
+    response_url = fields.get('response_url', '')
 
     logger.info(f"Received Slack command: {command_text}")
 
     # Immediately return "processing" response to avoid timeout
     # Process the actual request in the background
-    import asyncio
-    asyncio.create_task(_process_slack_command_async(command_text, response_url))
+    task = asyncio.create_task(_process_slack_command_async(command_text, response_url))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
     return {
         "response_type": "in_channel",
@@ -3,29 +3,67 @@ Sentry API Client
 Fetches error events from Sentry for analysis
 """
 
+import asyncio
+import importlib.util
 import logging
 import os
-from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+import random
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
 import hashlib
-import json
 
 import httpx
-from tenacity import (
-    retry,
-    stop_after_attempt,
-    wait_exponential,
-    retry_if_exception_type,
-)
+import orjson
 
 from config import get_config
 
 logger = logging.getLogger(__name__)
 
-# Simple in-memory cache for Sentry responses
+# Simple in-memory LRU cache for Sentry responses
 # Key: hash of (url, customer_id, timestamp, time_window_minutes)
-# Value: list of events
-_sentry_cache: Dict[str, List[Dict[str, Any]]] = {}
+# Value: (expiry time, list of events)
+SENTRY_CACHE_MAX_ENTRIES = 100
+_sentry_cache: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+
+# In-flight Sentry fetches keyed by cache key
+# Concurrent identical lookups await the same request instead of each calling Sentry
+_inflight_fetches: Dict[str, "asyncio.Task[List[Dict[str, Any]]]"] = {}
+
+# Windows ending less than this long ago get the short recent-window TTL
+# (Config.sentry_cache_recent_ttl_seconds) since they can still receive events
+SENTRY_CACHE_RECENT_WINDOW = timedelta(hours=1)
+
+# Window batching: when enabled, ±N-minute lookups (N <= the margin) are served
+# by slicing one cached query covering the surrounding 30-minute bucket plus
+# margin, so bursts of /loglens calls around an incident share a Sentry call.
+# Off by default because the wider query can hit Sentry's per-page event limit.
+SENTRY_BATCH_BUCKET = timedelta(minutes=30)
+SENTRY_BATCH_MARGIN = timedelta(minutes=15)
+_MIN_EVENT_TIME = datetime.min.replace(tzinfo=timezone.utc)
+
+# Stack frames shown per event in the LLM prompt
+STACK_TRACE_MAX_FRAMES = 5
+
+# Shared HTTP client, reused across requests so keep-alive connections and
+# TLS sessions to Sentry survive between /analyze calls
+SENTRY_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+SENTRY_HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+# HTTP/2 multiplexes concurrent fetches on one connection and HPACK-compresses
+# the repeated auth header; it needs the h2 package (httpx[http2])
+SENTRY_HTTP2 = importlib.util.find_spec("h2") is not None
+_client: Optional[httpx.AsyncClient] = None
+
+# Connection errors and timeouts are retried with exponential backoff
+# (2s, 4s, ... capped at SENTRY_RETRY_MAX_WAIT) plus up to
+# SENTRY_RETRY_JITTER seconds of jitter so concurrent retries don't line up
+SENTRY_MAX_ATTEMPTS = 3
+SENTRY_RETRY_MIN_WAIT = 2
+SENTRY_RETRY_MAX_WAIT = 10
+SENTRY_RETRY_JITTER = 1.0
 
 
 class SentryClientError(Exception):
@@ -61,66 +99,99 @@ def _parse_iso_timestamp(timestamp: str) -> datetime:
     Raises:
         ValueError: If timestamp format is invalid
     """
+    # fromisoformat accepts a trailing "Z" and any fractional-second
+    # precision on Python 3.11+, so no pre-processing is needed
     try:
-        # Handle both with and without timezone
-        if timestamp.endswith('Z'):
-            timestamp = timestamp.replace('Z', '+00:00')
-
-        # Python's fromisoformat can be strict about microseconds
-        # Handle timestamps with microseconds (6 digits) by parsing with strptime if needed
-        try:
-            return datetime.fromisoformat(timestamp)
-        except ValueError:
-            # Try parsing with explicit format for timestamps with microseconds
-            # Format: 2026-01-16T19:17:11.883000+00:00 or 2026-01-16 19:17:11.883000+00:00
-            for fmt in [
-                '%Y-%m-%dT%H:%M:%S.%f%z',
-                '%Y-%m-%d %H:%M:%S.%f%z',
-                '%Y-%m-%dT%H:%M:%S%z',
-                '%Y-%m-%d %H:%M:%S%z',
-            ]:
-                try:
-                    return datetime.strptime(timestamp, fmt)
-                except ValueError:
-                    continue
-            raise
-
-    except (ValueError, AttributeError) as e:
+        return datetime.fromisoformat(timestamp)
+    except (ValueError, TypeError) as e:
         raise ValueError(f"Invalid timestamp format: {timestamp}") from e
 
 
-def _format_datetime_for_sentry(dt: datetime) -> str:
+def _as_utc(dt: datetime) -> datetime:
+    """Return dt with naive values taken as UTC"""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt
+
+
+def _cache_ttl(end_time: datetime, config) -> float:
     """
-    Format datetime for Sentry API query
+    Pick the cache TTL for a query window
 
     Args:
-        dt: datetime object
+        end_time: End of the queried time window (naive values are taken as UTC)
+        config: Application config holding the TTL settings
+
+    Returns:
+        TTL in seconds
+    """
+    if datetime.now(timezone.utc) - _as_utc(end_time) < SENTRY_CACHE_RECENT_WINDOW:
+        return config.sentry_cache_recent_ttl_seconds
+    return config.sentry_cache_ttl_seconds
+
+
+def _event_time(event: Dict[str, Any]) -> datetime:
+    """
+    Get an event's creation time as an aware datetime
+
+    Events without a parsable time sort first and fall outside every window.
+
+    Args:
+        event: Sentry event dictionary
+
+    Returns:
+        Event time in UTC
+    """
+    try:
+        return _as_utc(_parse_iso_timestamp(event.get("dateCreated") or event.get("datetime")))
+    except ValueError:
+        return _MIN_EVENT_TIME
+
+
+def _get_client() -> httpx.AsyncClient:
+    """
+    Get the shared Sentry HTTP client, creating it on first use
+
+    The client carries the Authorization header, so requests don't pass it.
+    The header is updated in place if the auth token changes.
 
     Returns:
-        ISO format string suitable for Sentry API
+        Pooled httpx.AsyncClient instance
     """
-    return dt.isoformat()
+    global _client
+    authorization = f"Bearer {get_config().sentry_auth_token}"
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=SENTRY_HTTP2,
+            limits=SENTRY_HTTP_LIMITS,
+            timeout=SENTRY_HTTP_TIMEOUT,
+            headers={"Authorization": authorization},
+        )
+    elif _client.headers.get("Authorization") != authorization:
+        _client.headers["Authorization"] = authorization
+    return _client
+
+
+async def close_sentry_client() -> None:
+    """Close the shared Sentry HTTP client and its pooled connections"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
 
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type((httpx.RequestError, httpx.TimeoutException)),
-)
 async def _make_sentry_request(
     url: str,
-    headers: Dict[str, str],
     params: Dict[str, Any],
-    timeout: float = 30.0,
+    headers: Optional[Dict[str, str]] = None,
+    timeout: Optional[float] = None,
 ) -> Dict[str, Any]:
     """
     Make HTTP request to Sentry API with retry logic
 
     Args:
         url: Sentry API endpoint URL
-        headers: Request headers
         params: Query parameters
-        timeout: Request timeout in seconds
+        headers: Per-request header overrides (auth is set on the shared client)
+        timeout: Request timeout in seconds (defaults to SENTRY_HTTP_TIMEOUT)
 
     Returns:
         JSON response from Sentry API
@@ -129,50 +200,60 @@ async def _make_sentry_request(
         SentryAuthError: If authentication fails
         SentryRateLimitError: If rate limit is exceeded
         SentryAPIError: If API returns an error
+        httpx.RequestError: If every attempt fails to connect or times out
     """
-    async with httpx.AsyncClient() as client:
+    client = _get_client()
+    for attempt in range(SENTRY_MAX_ATTEMPTS):
         try:
             response = await client.get(
                 url,
                 headers=headers,
                 params=params,
-                timeout=timeout,
+                timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
             )
-
-            # Handle rate limiting
-            if response.status_code == 429:
-                retry_after = response.headers.get("Retry-After", "60")
-                logger.warning(f"Sentry rate limit exceeded. Retry after: {retry_after}s")
-                raise SentryRateLimitError(
-                    f"Rate limit exceeded. Retry after {retry_after} seconds."
-                )
-
-            # Handle authentication errors
-            if response.status_code == 401:
-                logger.error("Sentry authentication failed")
-                raise SentryAuthError("Invalid or expired Sentry auth token")
-
-            # Handle other client errors
-            if response.status_code == 404:
-                logger.error(f"Sentry project not found: {url}")
-                raise SentryAPIError("Sentry project not found. Check org/project names.")
-
-            # Handle server errors
-            if response.status_code >= 500:
-                logger.error(f"Sentry server error: {response.status_code}")
-                raise SentryAPIError(f"Sentry server error: {response.status_code}")
-
-            # Raise for other error status codes
-            response.raise_for_status()
-
-            return response.json()
-
-        except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error from Sentry API: {e}")
-            raise SentryAPIError(f"Sentry API error: {e}") from e
+            break
         except httpx.RequestError as e:
-            logger.error(f"Request error to Sentry API: {e}")
-            raise
+            if attempt == SENTRY_MAX_ATTEMPTS - 1:
+                logger.error(f"Request error to Sentry API: {e}")
+                raise
+            delay = min(SENTRY_RETRY_MAX_WAIT, SENTRY_RETRY_MIN_WAIT * 2 ** attempt)
+            delay += random.uniform(0, SENTRY_RETRY_JITTER)
+            logger.warning(f"Sentry request attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    try:
+        # Handle rate limiting
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "60")
+            logger.warning(f"Sentry rate limit exceeded. Retry after: {retry_after}s")
+            raise SentryRateLimitError(
+                f"Rate limit exceeded. Retry after {retry_after} seconds."
+            )
+
+        # Handle authentication errors
+        if response.status_code == 401:
+            logger.error("Sentry authentication failed")
+            raise SentryAuthError("Invalid or expired Sentry auth token")
+
+        # Handle other client errors
+        if response.status_code == 404:
+            logger.error(f"Sentry project not found: {url}")
+            raise SentryAPIError("Sentry project not found. Check org/project names.")
+
+        # Handle server errors
+        if response.status_code >= 500:
+            logger.error(f"Sentry server error: {response.status_code}")
+            raise SentryAPIError(f"Sentry server error: {response.status_code}")
+
+        # Raise for other error status codes
+        response.raise_for_status()
+
+        # orjson parses the large full=true payloads several times faster
+        return orjson.loads(response.content)
+
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error from Sentry API: {e}")
+        raise SentryAPIError(f"Sentry API error: {e}") from e
 
 
 async def fetch_sentry_events(
@@ -215,15 +296,23 @@ async def fetch_sentry_events(
     sentry_base_url = os.getenv("SENTRY_BASE_URL", "https://sentry.io")
     url = f"{sentry_base_url}/api/0/projects/{config.sentry_org}/{config.sentry_project}/events/"
 
-    # Build headers
-    headers = {
-        "Authorization": f"Bearer {config.sentry_auth_token}",
-    }
+    # Serve narrow windows from a cached query over the surrounding bucket
+    batched = config.sentry_window_batching_enabled and timedelta(minutes=time_window_minutes) <= SENTRY_BATCH_MARGIN
+    if batched:
+        bucket_start = center_time.replace(
+            minute=center_time.minute - center_time.minute % 30, second=0, microsecond=0
+        )
+        query_start = bucket_start - SENTRY_BATCH_MARGIN
+        query_end = bucket_start + SENTRY_BATCH_BUCKET + SENTRY_BATCH_MARGIN
+        cache_key = _generate_cache_key(url, customer_id, f"bucket:{bucket_start.isoformat()}", 0)
+    else:
+        query_start, query_end = start_time, end_time
+        cache_key = _generate_cache_key(url, customer_id, timestamp, time_window_minutes)
 
     # Build query parameters - fetch all events in time range
     params = {
-        "start": _format_datetime_for_sentry(start_time),
-        "end": _format_datetime_for_sentry(end_time),
+        "start": query_start.isoformat(),
+        "end": query_end.isoformat(),
         "full": "true",
     }
 
@@ -236,17 +325,24 @@ async def fetch_sentry_events(
         # Make request with caching (see _cached_fetch_events)
         response_data = await _cached_fetch_events(
             url=url,
-            customer_id=customer_id,
-            timestamp=timestamp,
-            time_window_minutes=time_window_minutes,
+            params=params,
+            cache_key=cache_key,
+            ttl_seconds=_cache_ttl(query_end, config),
+            sort_by_time=batched,
         )
 
+        if batched and isinstance(response_data, list):
+            # Cached bucket is sorted by event time, so bisect out our window
+            lo = bisect_left(response_data, _as_utc(start_time), key=_event_time)
+            hi = bisect_right(response_data, _as_utc(end_time), lo=lo, key=_event_time)
+            response_data = response_data[lo:hi]
+
         events = response_data if isinstance(response_data, list) else []
 
         logger.info(f"Found {len(events)} Sentry events for customer {customer_id}")
         return events
 
-    except (SentryAuthError, SentryRateLimitError, SentryAPIError) as e:
+    except SentryClientError:
         # Re-raise known Sentry errors
         raise
     except Exception as e:
@@ -272,73 +368,105 @@ def _generate_cache_key(
     Returns:
         Cache key string (hash of parameters)
     """
-    cache_data = {
-        "url": url,
-        "customer_id": customer_id,
-        "timestamp": timestamp,
-        "time_window_minutes": time_window_minutes,
-    }
-    cache_str = json.dumps(cache_data, sort_keys=True)
-    return hashlib.sha256(cache_str.encode()).hexdigest()
+    # The key never leaves the process, so a joined string plus a short
+    # blake2b digest (to keep log lines readable) is all that's needed
+    cache_str = f"{url}|{customer_id}|{timestamp}|{time_window_minutes}"
+    return hashlib.blake2b(cache_str.encode(), digest_size=16).hexdigest()
 
 
 async def _cached_fetch_events(
     url: str,
-    customer_id: str,
-    timestamp: str,
-    time_window_minutes: int,
+    params: Dict[str, Any],
+    cache_key: str,
+    ttl_seconds: float,
+    sort_by_time: bool = False,
 ) -> List[Dict[str, Any]]:
     """
     Cached version of Sentry event fetching to avoid rate limits
 
-    Uses simple in-memory cache to store recent queries. Cache key includes all
-    relevant parameters to ensure accuracy.
+    Uses simple in-memory cache to store recent queries. The request itself is
+    built by fetch_sentry_events; this layer only deals with lookup and storage.
 
     Args:
         url: Sentry API endpoint URL
-        customer_id: Customer ID
-        timestamp: ISO timestamp
-        time_window_minutes: Time window in minutes
+        params: Query parameters
+        cache_key: Key from _generate_cache_key
+        ttl_seconds: How long the fetched events stay valid
+        sort_by_time: Sort fetched events by creation time before caching them
 
     Returns:
         List of Sentry events
     """
-    # Generate cache key
-    cache_key = _generate_cache_key(url, customer_id, timestamp, time_window_minutes)
-
     # Check cache first
-    if cache_key in _sentry_cache:
-        logger.info(f"Using cached Sentry events for key {cache_key[:16]}...")
-        return _sentry_cache[cache_key]
+    now = time.monotonic()
+    entry = _sentry_cache.get(cache_key)
+    if entry is not None:
+        expires_at, events = entry
+        if now < expires_at:
+            logger.info(f"Using cached Sentry events for key {cache_key[:16]}...")
+            _sentry_cache.move_to_end(cache_key)
+            return events
+        del _sentry_cache[cache_key]
+
+    # Not in cache; join an identical fetch already in flight if there is one.
+    # The fetch runs in its own task so a cancelled caller only stops its own
+    # wait instead of cancelling the fetch for everyone sharing it.
+    task = _inflight_fetches.get(cache_key)
+    if task is not None:
+        logger.info(f"Joining in-flight Sentry fetch for key {cache_key[:16]}...")
+    else:
+        task = asyncio.ensure_future(
+            _fetch_and_store_events(url, params, cache_key, ttl_seconds, sort_by_time)
+        )
+        _inflight_fetches[cache_key] = task
+        task.add_done_callback(lambda done: _forget_inflight_fetch(cache_key, done))
+    return await asyncio.shield(task)
 
-    # Not in cache, fetch from API
-    config = get_config()
 
-    # Recalculate parameters
-    center_time = _parse_iso_timestamp(timestamp)
-    start_time = center_time - timedelta(minutes=time_window_minutes)
-    end_time = center_time + timedelta(minutes=time_window_minutes)
+def _forget_inflight_fetch(cache_key: str, task: "asyncio.Task[List[Dict[str, Any]]]") -> None:
+    """Done-callback dropping a finished shared fetch from _inflight_fetches"""
+    if _inflight_fetches.get(cache_key) is task:
+        del _inflight_fetches[cache_key]
+    # Mark the exception retrieved so it isn't reported when every caller left
+    if not task.cancelled():
+        task.exception()
 
-    headers = {
-        "Authorization": f"Bearer {config.sentry_auth_token}",
-    }
 
-    # Build query parameters - fetch all events in time range
-    params = {
-        "start": _format_datetime_for_sentry(start_time),
-        "end": _format_datetime_for_sentry(end_time),
-        "full": "true",
-    }
+async def _fetch_and_store_events(
+    url: str,
+    params: Dict[str, Any],
+    cache_key: str,
+    ttl_seconds: float,
+    sort_by_time: bool,
+) -> List[Dict[str, Any]]:
+    """
+    Fetch events from Sentry and store them in the cache
+
+    Args:
+        url: Sentry API endpoint URL
+        params: Query parameters
+        cache_key: Key from _generate_cache_key
+        ttl_seconds: How long the fetched events stay valid
+        sort_by_time: Sort fetched events by creation time before caching them
 
-    events = await _make_sentry_request(url, headers, params)
+    Returns:
+        List of Sentry events
+    """
+    events = await _make_sentry_request(url, params)
+    if sort_by_time and isinstance(events, list):
+        events.sort(key=_event_time)
 
-    # Store in cache (limit cache size to 100 entries)
-    if len(_sentry_cache) >= 100:
-        # Remove oldest entry (first key)
-        oldest_key = next(iter(_sentry_cache))
-        del _sentry_cache[oldest_key]
+    # Store in cache, dropping expired entries first and then the least
+    # recently used one if still full
+    now = time.monotonic()
+    for key in [key for key, (expires_at, _) in _sentry_cache.items() if now >= expires_at]:
+        del _sentry_cache[key]
+
+    _sentry_cache[cache_key] = (now + ttl_seconds, events)
+    _sentry_cache.move_to_end(cache_key)
+    if len(_sentry_cache) > SENTRY_CACHE_MAX_ENTRIES:
+        _sentry_cache.popitem(last=False)
 
-    _sentry_cache[cache_key] = events
     logger.info(f"Cached Sentry events with key {cache_key[:16]}...")
 
     return events
@@ -346,27 +474,54 @@ async def _cached_fetch_events(
 
 def clear_sentry_cache():
     """Clear the Sentry response cache (useful for testing)"""
-    global _sentry_cache
-    _sentry_cache = {}
+    _sentry_cache.clear()
 
 
-def generate_sentry_link(event_id: str, org: Optional[str] = None, project: Optional[str] = None) -> str:
+def _sentry_link_prefix(org: Optional[str] = None, project: Optional[str] = None) -> str:
     """
-    Generate a direct link to a Sentry event in the UI
+    Build the Sentry UI issue-search URL up to (and including) "query="
 
     Args:
-        event_id: Sentry event ID
         org: Sentry organization slug (defaults to config)
         project: Sentry project slug (defaults to config)
 
     Returns:
-        URL to the event in Sentry UI
+        URL prefix to which an event ID is appended
     """
     config = get_config()
     org_slug = org or config.sentry_org
     project_slug = project or config.sentry_project
     sentry_base_url = os.getenv("SENTRY_BASE_URL", "https://sentry.io")
-    return f"{sentry_base_url}/organizations/{org_slug}/issues/?project={project_slug}&query={event_id}"
+    return f"{sentry_base_url}/organizations/{org_slug}/issues/?project={project_slug}&query="
+
+
+def generate_sentry_link(event_id: str, org: Optional[str] = None, project: Optional[str] = None) -> str:
+    """
+    Generate a direct link to a Sentry event in the UI
+
+    Args:
+        event_id: Sentry event ID
+        org: Sentry organization slug (defaults to config)
+        project: Sentry project slug (defaults to config)
+
+    Returns:
+        URL to the event in Sentry UI
+    """
+    return _sentry_link_prefix(org, project) + event_id
+
+
+def generate_sentry_links(events: List[Dict[str, Any]]) -> List[str]:
+    """
+    Generate Sentry UI links for every event that has an ID
+
+    Args:
+        events: List of Sentry event dictionaries
+
+    Returns:
+        List of URLs, in event order
+    """
+    prefix = _sentry_link_prefix()
+    return [prefix + event_id for event in events if (event_id := event.get("id"))]
 
 
 def format_events_for_llm(events: List[Dict[str, Any]]) -> str:
@@ -390,6 +545,8 @@ def format_events_for_llm(events: List[Dict[str, Any]]) -> str:
         return "No Sentry events found."
 
     formatted_output = []
+    # Built on the first event with an ID, so events without IDs don't need config
+    link_prefix = None
 
     for idx, event in enumerate(events, 1):
         event_lines = [f"Event {idx}:"]
@@ -420,20 +577,20 @@ def format_events_for_llm(events: List[Dict[str, Any]]) -> str:
 
         # Extract stack trace if available
         # Sentry stores stack traces in entries -> exception -> values -> stacktrace
-        stack_trace = _extract_stack_trace(event)
+        # (limited to the top frames for brevity)
+        stack_trace, total_frames = _extract_stack_trace(event)
         if stack_trace:
-            event_lines.append(f"- Stack Trace:")
-            for frame in stack_trace[:5]:  # Limit to top 5 frames for brevity
-                event_lines.append(f"  {frame}")
-            if len(stack_trace) > 5:
-                event_lines.append(f"  ... ({len(stack_trace) - 5} more frames)")
+            event_lines.append("- Stack Trace:")
+            event_lines.extend(f"  {frame}" for frame in stack_trace)
+            if total_frames > len(stack_trace):
+                event_lines.append(f"  ... ({total_frames - len(stack_trace)} more frames)")
 
         # Extract breadcrumbs if available
         breadcrumbs = _extract_breadcrumbs(event)
         if breadcrumbs:
-            event_lines.append(f"- Breadcrumbs (user actions leading to error):")
-            for crumb in breadcrumbs[-5:]:  # Show last 5 breadcrumbs
-                event_lines.append(f"  {crumb}")
+            event_lines.append("- Breadcrumbs (user actions leading to error):")
+            # Show last 5 breadcrumbs
+            event_lines.extend(f"  {crumb}" for crumb in breadcrumbs[-5:])
 
         # Add context tags if available
         tags = event.get("tags", [])
@@ -449,56 +606,90 @@ def format_events_for_llm(events: List[Dict[str, Any]]) -> str:
         # Add Sentry link
         event_id = event.get("id", "")
         if event_id:
-            sentry_link = generate_sentry_link(event_id)
-            event_lines.append(f"- Link: {sentry_link}")
+            if link_prefix is None:
+                link_prefix = _sentry_link_prefix()
+            event_lines.append(f"- Link: {link_prefix}{event_id}")
 
         formatted_output.append("\n".join(event_lines))
 
     return "\n\n".join(formatted_output)
 
 
-def _extract_stack_trace(event: Dict[str, Any]) -> List[str]:
+def _format_frame(frame: Dict[str, Any]) -> str:
+    """
+    Format a single stack frame as "file:line in function() -> code"
+
+    Args:
+        frame: Sentry stack frame dictionary
+
+    Returns:
+        Formatted frame string
+    """
+    location = f"{frame.get('filename', 'unknown')}:{frame.get('lineNo', '?')} in {frame.get('function', 'unknown')}()"
+
+    # Context is usually [line_before, actual_line, line_after]
+    context = frame.get("context")
+    if context:
+        code_line = context[len(context) // 2][1].strip()
+        if code_line:
+            return f"{location} -> {code_line}"
+    return location
+
+
+def _extract_stack_trace(
+    event: Dict[str, Any],
+    max_frames: int = STACK_TRACE_MAX_FRAMES,
+) -> Tuple[List[str], int]:
     """
     Extract and format stack trace from a Sentry event
 
+    Only the first max_frames frames are formatted; the rest are just counted.
+
     Args:
         event: Sentry event dictionary
+        max_frames: Maximum number of frames to format
 
     Returns:
-        List of formatted stack trace frames
-    """
-    frames = []
-
-    # Try to extract from entries
-    entries = event.get("entries", [])
-    for entry in entries:
-        if entry.get("type") == "exception":
-            values = entry.get("data", {}).get("values", [])
-            for value in values:
-                stacktrace = value.get("stacktrace", {})
-                raw_frames = stacktrace.get("frames", [])
-
-                # Format frames (most recent last)
-                for frame in raw_frames:
-                    filename = frame.get("filename", "unknown")
-                    function = frame.get("function", "unknown")
-                    lineno = frame.get("lineNo", "?")
-                    context = frame.get("context", [])
-
-                    # Get the actual code line if available
-                    code_line = ""
-                    if context:
-                        # Context is usually [line_before, actual_line, line_after]
-                        middle_idx = len(context) // 2
-                        if middle_idx < len(context):
-                            code_line = context[middle_idx][1].strip()
-
-                    if code_line:
-                        frames.append(f"{filename}:{lineno} in {function}() -> {code_line}")
-                    else:
-                        frames.append(f"{filename}:{lineno} in {function}()")
-
-    return frames
+        Tuple of (formatted frames, total frame count across all exceptions)
+    """
+    frames: List[str] = []
+    total_frames = 0
+
+    for entry in event.get("entries", ()):
+        if entry.get("type") != "exception":
+            continue
+        for value in (entry.get("data") or {}).get("values", ()):
+            raw_frames = (value.get("stacktrace") or {}).get("frames") or ()
+            remaining = max_frames - len(frames)
+            if remaining > 0:
+                frames.extend(_format_frame(frame) for frame in raw_frames[:remaining])
+            total_frames += len(raw_frames)
+
+    return frames, total_frames
+
+
+def _format_breadcrumb(breadcrumb: Dict[str, Any]) -> str:
+    """
+    Format a single breadcrumb as "[level] category: message"
+
+    Breadcrumbs without a message show up to three of their data fields instead.
+
+    Args:
+        breadcrumb: Sentry breadcrumb dictionary
+
+    Returns:
+        Formatted breadcrumb string
+    """
+    prefix = f"[{breadcrumb.get('level', 'info')}] {breadcrumb.get('category', '')}"
+
+    message = breadcrumb.get("message")
+    if message:
+        return f"{prefix}: {message}"
+
+    data = breadcrumb.get("data")
+    if data:
+        return f"{prefix}: " + ", ".join(f"{k}={v}" for k, v in islice(data.items(), 3))
+    return prefix
 
 
 def _extract_breadcrumbs(event: Dict[str, Any]) -> List[str]:
@@ -513,29 +704,9 @@ def _extract_breadcrumbs(event: Dict[str, Any]) -> List[str]:
     Returns:
         List of formatted breadcrumb strings
     """
-    crumbs = []
-
-    # Try to extract from entries
-    entries = event.get("entries", [])
-    for entry in entries:
-        if entry.get("type") == "breadcrumbs":
-            values = entry.get("data", {}).get("values", [])
-            for breadcrumb in values:
-                timestamp = breadcrumb.get("timestamp", "")
-                category = breadcrumb.get("category", "")
-                message = breadcrumb.get("message", "")
-                level = breadcrumb.get("level", "info")
-
-                # Format breadcrumb
-                if message:
-                    crumbs.append(f"[{level}] {category}: {message}")
-                else:
-                    # Some breadcrumbs might have data instead of message
-                    data = breadcrumb.get("data", {})
-                    if data:
-                        data_str = ", ".join(f"{k}={v}" for k, v in list(data.items())[:3])
-                        crumbs.append(f"[{level}] {category}: {data_str}")
-                    else:
-                        crumbs.append(f"[{level}] {category}")
-
-    return crumbs
+    return [
+        _format_breadcrumb(breadcrumb)
+        for entry in event.get("entries", ())
+        if entry.get("type") == "breadcrumbs"
+        for breadcrumb in (entry.get("data") or {}).get("values", ())
+    ]
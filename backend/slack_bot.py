@@ -6,18 +6,61 @@ Handles /loglens slash command and formats responses for Slack
 import logging
 import hmac
 import hashlib
+import re
 import time
-from typing import Dict, Any
-from config import get_config
+from datetime import datetime
+from typing import Dict, Any, Optional
 
-logger = logging.getLogger(__name__)
+import httpx
+
+# Modules are imported whole and their functions looked up at call time,
+# so tests can patch e.g. sentry_client.fetch_sentry_events
+import analyzer
+import knowledge_base
+import sentry_client
+from analyzer import LLMAnalysisError, LLMResponseFormatError, LLMAPIError
+from sentry_client import SentryClientError, SentryAuthError, SentryRateLimitError
 
+logger = logging.getLogger(__name__)
 
 class SlackSignatureVerificationError(Exception):
     """Raised when Slack signature verification fails"""
     pass
 
 
+# Shared HTTP client for posting results back to Slack response_urls, so
+# bursts of commands reuse connections to hooks.slack.com
+SLACK_HTTP_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+_http_client: Optional[httpx.AsyncClient] = None
+
+# Requests older than this are rejected to prevent replay attacks
+SLACK_TIMESTAMP_MAX_AGE_SECONDS = 60 * 5
+
+# HMAC keyed with the signing secret, copied per request so the key isn't
+# re-encoded and re-scheduled every time
+_hmac_prototype = None
+_hmac_prototype_secret = None
+
+
+def _get_hmac_prototype(signing_secret: str) -> "hmac.HMAC":
+    """
+    Get the HMAC-SHA256 prototype for the signing secret, creating it on first use
+
+    The prototype is rebuilt if the secret changes.
+
+    Args:
+        signing_secret: Slack app signing secret
+
+    Returns:
+        HMAC object with no data fed in yet; callers must copy() it
+    """
+    global _hmac_prototype, _hmac_prototype_secret
+    if _hmac_prototype is None or _hmac_prototype_secret != signing_secret:
+        _hmac_prototype = hmac.new(signing_secret.encode('utf-8'), digestmod=hashlib.sha256)
+        _hmac_prototype_secret = signing_secret
+    return _hmac_prototype
+
+
 def verify_slack_signature(
     body: bytes,
     timestamp: str,
@@ -40,22 +83,25 @@ def verify_slack_signature(
         SlackSignatureVerificationError: If signature verification fails
     """
     # Verify timestamp is recent (within 5 minutes)
-    current_timestamp = int(time.time())
-    request_timestamp = int(timestamp)
+    try:
+        request_timestamp = float(timestamp)
+    except (TypeError, ValueError):
+        logger.warning(f"Invalid Slack request timestamp: {timestamp}")
+        raise SlackSignatureVerificationError("Invalid request timestamp")
 
-    if abs(current_timestamp - request_timestamp) > 60 * 5:
+    # Written as "not <=" so a NaN timestamp is rejected too
+    if not abs(time.time() - request_timestamp) <= SLACK_TIMESTAMP_MAX_AGE_SECONDS:
         logger.warning(f"Slack request timestamp too old: {timestamp}")
         raise SlackSignatureVerificationError("Request timestamp too old")
 
-    # Construct the signature base string
-    sig_basestring = f"v0:{timestamp}:{body.decode('utf-8')}"
+    # Construct the signature base string (as bytes, so the body isn't
+    # decoded and re-encoded)
+    sig_basestring = b"v0:" + timestamp.encode('utf-8') + b":" + body
 
     # Calculate expected signature
-    expected_signature = 'v0=' + hmac.new(
-        signing_secret.encode('utf-8'),
-        sig_basestring.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest()
+    mac = _get_hmac_prototype(signing_secret).copy()
+    mac.update(sig_basestring)
+    expected_signature = 'v0=' + mac.hexdigest()
 
     # Compare signatures using constant-time comparison
     if not hmac.compare_digest(expected_signature, signature):
@@ -65,6 +111,11 @@ def verify_slack_signature(
     logger.info("Slack signature verified successfully")
 
 
+# "[description] | [timestamp] | [customer_id]"; empty fields still match so
+# they get a specific error below
+_COMMAND_PATTERN = re.compile(r"\s*([^|]*?)\s*\|\s*([^|]*?)\s*\|\s*([^|]*?)\s*")
+
+
 def parse_slack_command(command_text: str) -> Dict[str, str]:
     """
     Parse /loglens command text into components.
@@ -81,15 +132,14 @@ def parse_slack_command(command_text: str) -> Dict[str, str]:
     Raises:
         ValueError: If command format is invalid
     """
-    # Split by pipe character
-    parts = [part.strip() for part in command_text.split('|')]
-
-    if len(parts) != 3:
+    # Split into exactly three pipe-separated, whitespace-trimmed fields
+    match = _COMMAND_PATTERN.fullmatch(command_text)
+    if match is None:
         raise ValueError(
             "Invalid command format. Use: /loglens [description] | [timestamp] | [customer_id]"
         )
 
-    description, timestamp, customer_id = parts
+    description, timestamp, customer_id = match.groups()
 
     # Validate that none of the parts are empty
     if not description:
@@ -106,6 +156,19 @@ def parse_slack_command(command_text: str) -> Dict[str, str]:
     }
 
 
+# Block Kit pieces that are the same in every response. They're shared, not
+# copied, so nothing may mutate a formatted response's blocks.
+_RANK_EMOJI = {1: "1️⃣", 2: "2️⃣", 3: "3️⃣"}
+_HEADER_BLOCK = {
+    "type": "header",
+    "text": {
+        "type": "plain_text",
+        "text": "🔍 LogLens Analysis"
+    }
+}
+_DIVIDER_BLOCK = {"type": "divider"}
+
+
 def format_slack_response(analysis_result: Dict[str, Any]) -> Dict[str, Any]:
     """
     Format analysis results for Slack display using Block Kit.
@@ -123,41 +186,27 @@ def format_slack_response(analysis_result: Dict[str, Any]) -> Dict[str, Any]:
     sentry_links = analysis_result.get("sentry_links", [])
 
     # Build blocks for Slack message
-    blocks = []
-
-    # Header
-    blocks.append({
-        "type": "header",
-        "text": {
-            "type": "plain_text",
-            "text": "🔍 LogLens Analysis"
-        }
-    })
+    blocks = [_HEADER_BLOCK]
 
     # Probable Causes section
     if causes:
-        causes_text = "*Probable Causes:*\n\n"
-        emoji_map = {1: "1️⃣", 2: "2️⃣", 3: "3️⃣"}
-
+        causes_parts = ["*Probable Causes:*\n\n"]
         for cause in causes:
-            rank = cause.get("rank", 0)
-            confidence = cause.get("confidence", "").upper()
-            cause_text = cause.get("cause", "")
-            explanation = cause.get("explanation", "")
-
-            emoji = emoji_map.get(rank, "•")
-            causes_text += f"{emoji} *[{confidence}]* {cause_text}\n"
-            causes_text += f"   └ {explanation}\n\n"
+            causes_parts.append(
+                f"{_RANK_EMOJI.get(cause.get('rank', 0), '•')} "
+                f"*[{cause.get('confidence', '').upper()}]* {cause.get('cause', '')}\n"
+                f"   └ {cause.get('explanation', '')}\n\n"
+            )
 
         blocks.append({
             "type": "section",
             "text": {
                 "type": "mrkdwn",
-                "text": causes_text.strip()
+                "text": "".join(causes_parts).strip()
             }
         })
 
-    blocks.append({"type": "divider"})
+    blocks.append(_DIVIDER_BLOCK)
 
     # Suggested Response section
     if suggested_response:
@@ -169,7 +218,7 @@ def format_slack_response(analysis_result: Dict[str, Any]) -> Dict[str, Any]:
             }
         })
 
-        blocks.append({"type": "divider"})
+        blocks.append(_DIVIDER_BLOCK)
 
     # Logs summary
     logs_text = f"*Logs:* Found {events_found} event"
@@ -217,6 +266,72 @@ def format_slack_error(error_message: str, suggestion: str = "") -> Dict[str, An
     }
 
 
+def _get_http_client() -> httpx.AsyncClient:
+    """
+    Get the shared Slack HTTP client, creating it on first use
+
+    Returns:
+        Pooled httpx.AsyncClient instance
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(timeout=SLACK_HTTP_TIMEOUT)
+    return _http_client
+
+
+async def close_slack_client() -> None:
+    """Close the shared Slack HTTP client and its pooled connections"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+async def post_to_response_url(
+    response_url: str,
+    message: Dict[str, Any],
+    timeout: Optional[float] = None,
+) -> None:
+    """
+    Post a message to a slash command's response_url
+
+    Args:
+        response_url: URL Slack provided with the command
+        message: Slack-formatted message
+        timeout: Request timeout in seconds (defaults to SLACK_HTTP_TIMEOUT)
+    """
+    await _get_http_client().post(
+        response_url,
+        json=message,
+        timeout=httpx.USE_CLIENT_DEFAULT if timeout is None else timeout,
+    )
+
+
+# Slack error (message, suggestion) for each analysis failure, looked up by
+# exact exception type. Sentry errors not listed (SentryAPIError) don't stop
+# the analysis; it continues without events. Other LLM errors show their text.
+_SENTRY_ERRORS = {
+    SentryAuthError: (
+        "Sentry authentication failed",
+        "Please verify Sentry credentials are configured correctly",
+    ),
+    SentryRateLimitError: (
+        "Sentry rate limit exceeded",
+        "Please try again in a few minutes",
+    ),
+}
+_LLM_ERRORS = {
+    LLMResponseFormatError: (
+        "Analysis failed: Invalid response from AI",
+        "Please try again or contact support",
+    ),
+    LLMAPIError: (
+        "Analysis failed: AI service error",
+        "Please try again in a few moments",
+    ),
+}
+
+
 async def handle_slack_command(command_text: str) -> dict:
     """
     Handle /loglens slash command from Slack
@@ -238,19 +353,6 @@ async def handle_slack_command(command_text: str) -> dict:
     except ValueError as e:
         return format_slack_error(str(e), "Use format: /loglens [description] | [timestamp] | [customer_id]")
 
-    # Import analysis modules
-    try:
-        from sentry_client import fetch_sentry_events, format_events_for_llm, SentryAuthError, SentryRateLimitError, SentryAPIError
-        from analyzer import analyze_logs, LLMAnalysisError, LLMResponseFormatError, LLMAPIError
-        from datetime import datetime, timedelta
-        import os
-    except ImportError as e:
-        logger.error(f"Failed to import required modules: {e}")
-        return format_slack_error(
-            "Internal error: Missing dependencies",
-            "Please contact support"
-        )
-
     # Extract parsed values
     description = parsed["description"]
     timestamp_str = parsed["timestamp"]
@@ -259,8 +361,8 @@ async def handle_slack_command(command_text: str) -> dict:
     # Validate timestamp format
     try:
         # Just validate the format, don't convert yet
-        datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-    except (ValueError, AttributeError) as e:
+        datetime.fromisoformat(timestamp_str)
+    except (ValueError, TypeError) as e:
         logger.error(f"Invalid timestamp format: {timestamp_str}")
         return format_slack_error(
             f"Invalid timestamp: {timestamp_str}",
@@ -269,32 +371,19 @@ async def handle_slack_command(command_text: str) -> dict:
 
     # Fetch Sentry events (use timestamp string directly)
     try:
-        events = await fetch_sentry_events(customer_id, timestamp_str, time_window_minutes=5)
-        formatted_events = format_events_for_llm(events)
+        events = await sentry_client.fetch_sentry_events(customer_id, timestamp_str, time_window_minutes=5)
+        formatted_events = sentry_client.format_events_for_llm(events)
 
         # Generate Sentry links from events
-        sentry_links = []
-        config = get_config()
-        for event in events:
-            event_id = event.get("id", "")
-            if event_id:
-                link = f"https://sentry.io/organizations/{config.sentry_org}/issues/?project={config.sentry_project}&query={event_id}"
-                sentry_links.append(link)
+        sentry_links = sentry_client.generate_sentry_links(events)
 
         events_found = len(events)
-    except SentryAuthError as e:
-        logger.error(f"Sentry authentication failed: {e}")
-        return format_slack_error(
-            "Sentry authentication failed",
-            "Please verify Sentry credentials are configured correctly"
-        )
-    except SentryRateLimitError as e:
-        logger.error(f"Sentry rate limit exceeded: {e}")
-        return format_slack_error(
-            "Sentry rate limit exceeded",
-            "Please try again in a few minutes"
-        )
-    except SentryAPIError as e:
+    except SentryClientError as e:
+        error = _SENTRY_ERRORS.get(type(e))
+        if error is not None:
+            logger.error(f"{error[0]}: {e}")
+            return format_slack_error(*error)
+
         # Don't fail completely - continue with no events
         logger.warning(f"Sentry API error (continuing without events): {e}")
         formatted_events = ""
@@ -307,51 +396,20 @@ async def handle_slack_command(command_text: str) -> dict:
             "An unexpected error occurred. Please try again."
         )
 
-    # Load knowledge base files
-    try:
-        backend_dir = os.path.dirname(os.path.abspath(__file__))
-        workflow_path = os.path.join(backend_dir, "docs", "workflow.md")
-        known_errors_path = os.path.join(backend_dir, "docs", "known_errors.md")
-
-        with open(workflow_path, "r") as f:
-            workflow_docs = f.read()
-        with open(known_errors_path, "r") as f:
-            known_errors_docs = f.read()
-    except FileNotFoundError as e:
-        logger.error(f"Knowledge base file not found: {e}")
-        return format_slack_error(
-            "Internal error: Knowledge base not found",
-            "Please contact support"
-        )
-
     # Run LLM analysis
     try:
-        llm_response = await analyze_logs(
+        llm_response = await analyzer.analyze_logs(
             description=description,
             timestamp=timestamp_str,
             customer_id=customer_id,
             formatted_events=formatted_events,
-            workflow_docs=workflow_docs,
-            known_errors=known_errors_docs
-        )
-    except LLMResponseFormatError as e:
-        logger.error(f"LLM returned invalid response format: {e}")
-        return format_slack_error(
-            "Analysis failed: Invalid response from AI",
-            "Please try again or contact support"
-        )
-    except LLMAPIError as e:
-        logger.error(f"OpenAI API error: {e}")
-        return format_slack_error(
-            "Analysis failed: AI service error",
-            "Please try again in a few moments"
+            workflow_docs=knowledge_base.WORKFLOW_DOCS,
+            known_errors=knowledge_base.KNOWN_ERRORS_DOCS
         )
     except LLMAnalysisError as e:
-        logger.error(f"LLM analysis failed: {e}")
-        return format_slack_error(
-            "Analysis failed",
-            str(e)
-        )
+        error = _LLM_ERRORS.get(type(e), ("Analysis failed", str(e)))
+        logger.error(f"{error[0]}: {e}")
+        return format_slack_error(*error)
     except Exception as e:
         logger.error(f"Unexpected error during LLM analysis: {e}", exc_info=True)
         return format_slack_error(
@@ -2,14 +2,21 @@
 Tests for LLM Analyzer (Task 4.1)
 """
 
+import asyncio
+import time
 import pytest
 import json
+from types import SimpleNamespace
 from unittest.mock import AsyncMock, patch, MagicMock
 from analyzer import (
     analyze_logs,
+    clear_llm_cache,
+    _construct_static_prompt,
     _construct_user_prompt,
     _validate_llm_response,
     _call_openai_api,
+    _get_openai_client,
+    warm_prompt_cache,
     LLMAnalysisError,
     LLMResponseFormatError,
     LLMAPIError,
@@ -17,6 +24,9 @@ from analyzer import (
 )
 
 
+# Real sleep, since no_retry_wait patches asyncio.sleep for every test
+_real_sleep = asyncio.sleep
+
 # Sample test data
 SAMPLE_DESCRIPTION = "User can't complete checkout"
 SAMPLE_TIMESTAMP = "2025-01-19T14:30:00Z"
@@ -55,6 +65,41 @@ VALID_LLM_RESPONSE = {
 }
 
 
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    """Start every test with an empty response cache"""
+    clear_llm_cache()
+    yield
+    clear_llm_cache()
+
+
+def _openai_stream(content, finish_reason="stop"):
+    """Build a fake streamed OpenAI response delivering content in two chunks"""
+    parts = [content[:len(content) // 2], content[len(content) // 2:]] if content else [content]
+
+    async def stream():
+        for i, part in enumerate(parts):
+            reason = finish_reason if i == len(parts) - 1 else None
+            choice = SimpleNamespace(delta=SimpleNamespace(content=part), finish_reason=reason)
+            yield SimpleNamespace(choices=[choice])
+
+    return stream()
+
+
+@pytest.fixture(autouse=True)
+def fresh_openai_client():
+    """Don't reuse an OpenAI client built by an earlier test"""
+    with patch("analyzer._openai_client", None):
+        yield
+
+
+@pytest.fixture(autouse=True)
+def no_retry_wait():
+    """Skip the backoff between retried API calls"""
+    with patch("analyzer.asyncio.sleep", new=AsyncMock()):
+        yield
+
+
 class TestConstructUserPrompt:
     """Test prompt construction"""
 
@@ -92,11 +137,38 @@ class TestConstructUserPrompt:
             known_errors=SAMPLE_KNOWN_ERRORS
         )
 
-        assert "Analyze and respond in JSON format:" in prompt
+        assert "Analyze and respond in JSON format" in prompt
         assert '"causes"' in prompt
         assert '"suggested_response"' in prompt
         assert '"logs_summary"' in prompt
 
+    def test_static_content_precedes_request_data(self):
+        """Test that docs and format spec form a prefix shared by all requests"""
+        prompts = [
+            _construct_user_prompt(
+                description=description,
+                timestamp=SAMPLE_TIMESTAMP,
+                customer_id=SAMPLE_CUSTOMER_ID,
+                formatted_events=SAMPLE_FORMATTED_EVENTS,
+                workflow_docs=SAMPLE_WORKFLOW,
+                known_errors=SAMPLE_KNOWN_ERRORS
+            )
+            for description in (SAMPLE_DESCRIPTION, "Another problem")
+        ]
+
+        prefix = prompts[0].split("## Sentry Events")[0]
+        assert prompts[1].startswith(prefix)
+        assert SAMPLE_KNOWN_ERRORS in prefix
+        assert "Analyze and respond in JSON format" in prefix
+
+    def test_static_prompt_is_memoized(self):
+        """Test that the same docs reuse the already-built static prompt"""
+        first = _construct_static_prompt(SAMPLE_WORKFLOW, SAMPLE_KNOWN_ERRORS)
+        second = _construct_static_prompt(SAMPLE_WORKFLOW, SAMPLE_KNOWN_ERRORS)
+
+        assert first is second
+        assert _construct_static_prompt("other docs", SAMPLE_KNOWN_ERRORS) != first
+
 
 class TestValidateLLMResponse:
     """Test LLM response validation"""
@@ -203,9 +275,7 @@ class TestCallOpenAIAPI:
     async def test_successful_api_call(self):
         """Test successful API call"""
         mock_client = MagicMock()
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(content='{"test": "response"}'))]
-        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        mock_client.chat.completions.create = AsyncMock(return_value=_openai_stream('{"test": "response"}'))
 
         messages = [{"role": "system", "content": "test"}]
         result = await _call_openai_api(mock_client, messages)
@@ -216,9 +286,7 @@ class TestCallOpenAIAPI:
     async def test_api_call_with_empty_response(self):
         """Test API call with empty response raises error"""
         mock_client = MagicMock()
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(content=None))]
-        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        mock_client.chat.completions.create = AsyncMock(return_value=_openai_stream(None))
 
         messages = [{"role": "system", "content": "test"}]
 
@@ -235,6 +303,28 @@ class TestCallOpenAIAPI:
         with pytest.raises(LLMAPIError, match="OpenAI API call failed"):
             await _call_openai_api(mock_client, messages)
 
+    async def test_concurrent_backoffs_do_not_block(self):
+        """Test that retry backoff yields to the event loop instead of sleeping in it"""
+        def make_client():
+            client = MagicMock()
+            client.chat.completions.create = AsyncMock(
+                side_effect=[Exception("busy"), _openai_stream('{"test": "response"}')]
+            )
+            return client
+
+        messages = [{"role": "system", "content": "test"}]
+
+        with patch("analyzer.asyncio.sleep", new=_real_sleep), \
+                patch("analyzer.LLM_RETRY_MIN_WAIT", 0.05), \
+                patch("analyzer.LLM_RETRY_JITTER", 0):
+            start = time.perf_counter()
+            results = await asyncio.gather(*[_call_openai_api(make_client(), messages) for _ in range(20)])
+            elapsed = time.perf_counter() - start
+
+        assert results == ['{"test": "response"}'] * 20
+        # 20 overlapping 50ms backoffs, far below the 1s they'd take back to back
+        assert elapsed < 0.5
+
 
 @pytest.mark.asyncio
 class TestAnalyzeLogs:
@@ -246,14 +336,14 @@ class TestAnalyzeLogs:
         """Test successful log analysis"""
         # Mock config
         mock_config = MagicMock()
+        mock_config.llm_provider = "openai"
         mock_config.openai_api_key = "test-key"
+        mock_config.llm_max_concurrency = 8
         mock_get_config.return_value = mock_config
 
         # Mock OpenAI client
         mock_client = MagicMock()
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(content=json.dumps(VALID_LLM_RESPONSE)))]
-        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        mock_client.chat.completions.create = AsyncMock(return_value=_openai_stream(json.dumps(VALID_LLM_RESPONSE)))
         mock_openai_class.return_value = mock_client
 
         result = await analyze_logs(
@@ -282,7 +372,8 @@ class TestAnalyzeLogs:
         assert call_kwargs["model"] == "gpt-4o"
         assert call_kwargs["response_format"] == {"type": "json_object"}
         assert call_kwargs["temperature"] == 0.7
-        assert call_kwargs["max_tokens"] == 1500
+        assert call_kwargs["max_tokens"] <= 1500
+        assert call_kwargs["stream"] is True
 
     @patch("analyzer.AsyncOpenAI")
     @patch("analyzer.get_config")
@@ -290,7 +381,9 @@ class TestAnalyzeLogs:
         """Test analysis with no Sentry events"""
         # Mock config
         mock_config = MagicMock()
+        mock_config.llm_provider = "openai"
         mock_config.openai_api_key = "test-key"
+        mock_config.llm_max_concurrency = 8
         mock_get_config.return_value = mock_config
 
         # Mock OpenAI to return response indicating no events
@@ -320,9 +413,7 @@ class TestAnalyzeLogs:
         }
 
         mock_client = MagicMock()
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(content=json.dumps(no_events_response)))]
-        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        mock_client.chat.completions.create = AsyncMock(return_value=_openai_stream(json.dumps(no_events_response)))
         mock_openai_class.return_value = mock_client
 
         result = await analyze_logs(
@@ -342,17 +433,17 @@ class TestAnalyzeLogs:
     async def test_analysis_with_malformed_json(self, mock_get_config, mock_openai_class):
         """Test analysis with malformed JSON response"""
         mock_config = MagicMock()
+        mock_config.llm_provider = "openai"
         mock_config.openai_api_key = "test-key"
+        mock_config.llm_max_concurrency = 8
         mock_get_config.return_value = mock_config
 
         # Mock OpenAI to return invalid JSON
         mock_client = MagicMock()
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(content="Not valid JSON{"))]
-        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        mock_client.chat.completions.create = AsyncMock(return_value=_openai_stream("Not valid JSON{"))
         mock_openai_class.return_value = mock_client
 
-        with pytest.raises(LLMResponseFormatError, match="Invalid JSON response from LLM"):
+        with pytest.raises(LLMResponseFormatError, match="Invalid JSON in LLM response"):
             await analyze_logs(
                 description=SAMPLE_DESCRIPTION,
                 timestamp=SAMPLE_TIMESTAMP,
@@ -367,7 +458,9 @@ class TestAnalyzeLogs:
     async def test_analysis_with_openai_api_error(self, mock_get_config, mock_openai_class):
         """Test analysis handles OpenAI API errors"""
         mock_config = MagicMock()
+        mock_config.llm_provider = "openai"
         mock_config.openai_api_key = "test-key"
+        mock_config.llm_max_concurrency = 8
         mock_get_config.return_value = mock_config
 
         # Mock OpenAI to raise an exception
@@ -390,13 +483,13 @@ class TestAnalyzeLogs:
     async def test_prompt_construction_in_analysis(self, mock_get_config, mock_openai_class):
         """Test that prompts are correctly constructed in analysis"""
         mock_config = MagicMock()
+        mock_config.llm_provider = "openai"
         mock_config.openai_api_key = "test-key"
+        mock_config.llm_max_concurrency = 8
         mock_get_config.return_value = mock_config
 
         mock_client = MagicMock()
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(message=MagicMock(content=json.dumps(VALID_LLM_RESPONSE)))]
-        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        mock_client.chat.completions.create = AsyncMock(return_value=_openai_stream(json.dumps(VALID_LLM_RESPONSE)))
         mock_openai_class.return_value = mock_client
 
         await analyze_logs(
@@ -427,6 +520,65 @@ class TestAnalyzeLogs:
         assert SAMPLE_WORKFLOW in user_content
         assert SAMPLE_KNOWN_ERRORS in user_content
 
+    @patch("analyzer.AsyncOpenAI")
+    @patch("analyzer.get_config")
+    async def test_warm_prompt_cache_sends_static_prefix(
+        self, mock_get_config, mock_openai_class, caplog
+    ):
+        """Test that warming sends a one-token request sharing the analysis prefix"""
+        mock_config = MagicMock()
+        mock_config.llm_provider = "openai"
+        mock_config.openai_api_key = "test-key"
+        mock_config.llm_max_concurrency = 8
+        mock_config.llm_warm_prompt_cache = True
+        mock_get_config.return_value = mock_config
+
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(side_effect=[
+            _openai_stream("{", finish_reason="length"),
+            _openai_stream(json.dumps(VALID_LLM_RESPONSE)),
+        ])
+        mock_openai_class.return_value = mock_client
+
+        await warm_prompt_cache(SAMPLE_WORKFLOW, SAMPLE_KNOWN_ERRORS)
+        # The one-token cap cuts the warm-up short on purpose; that isn't worth a warning
+        assert "may be incomplete" not in caplog.text
+        await analyze_logs(
+            description=SAMPLE_DESCRIPTION,
+            timestamp=SAMPLE_TIMESTAMP,
+            customer_id=SAMPLE_CUSTOMER_ID,
+            formatted_events=SAMPLE_FORMATTED_EVENTS,
+            workflow_docs=SAMPLE_WORKFLOW,
+            known_errors=SAMPLE_KNOWN_ERRORS
+        )
+
+        warm_kwargs, analysis_kwargs = [c[1] for c in mock_client.chat.completions.create.call_args_list]
+        assert warm_kwargs["max_tokens"] == 1
+        assert warm_kwargs["messages"][0] == analysis_kwargs["messages"][0]
+        warm_prompt = warm_kwargs["messages"][1]["content"]
+        assert analysis_kwargs["messages"][1]["content"].startswith(warm_prompt)
+
+
+class TestOpenAIClientReuse:
+    """Test that the OpenAI client is shared across requests"""
+
+    @patch("analyzer.AsyncOpenAI")
+    def test_client_created_once(self, mock_openai_class):
+        """Test that repeated lookups reuse the same client"""
+        first = _get_openai_client("test-key")
+        second = _get_openai_client("test-key")
+
+        assert first is second
+        mock_openai_class.assert_called_once_with(api_key="test-key")
+
+    @patch("analyzer.AsyncOpenAI")
+    def test_client_rebuilt_when_key_changes(self, mock_openai_class):
+        """Test that a new API key gets a new client"""
+        _get_openai_client("key-1")
+        _get_openai_client("key-2")
+
+        assert mock_openai_class.call_count == 2
+
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -5,7 +5,9 @@ Validates environment variable loading and validation
 
 import os
 import pytest
-from config import Config
+from dataclasses import FrozenInstanceError
+
+from config import Config, get_config
 
 
 class TestConfigLoading:
@@ -248,5 +250,145 @@ class TestConfigErrorMessages:
         assert error_message.count("SLACK_BOT_TOKEN") <= 1
 
 
+class TestConfigCaching:
+    """Test that config is loaded once and cannot be mutated"""
+
+    @pytest.fixture(autouse=True)
+    def full_env(self, monkeypatch):
+        """Set all required vars and start with an empty config cache"""
+        for key in ["SENTRY_AUTH_TOKEN", "SENTRY_ORG", "SENTRY_PROJECT", "GEMINI_API_KEY",
+                    "SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "APP_PASSWORD"]:
+            monkeypatch.setenv(key, "test")
+        get_config.cache_clear()
+        yield
+        get_config.cache_clear()
+
+    def test_get_config_returns_same_instance(self):
+        """Test that repeated calls reuse the loaded config"""
+        assert get_config() is get_config()
+
+    def test_cache_clear_reloads_environment(self, monkeypatch):
+        """Test that clearing the cache picks up environment changes"""
+        first = get_config()
+        monkeypatch.setenv("APP_PASSWORD", "changed")
+        get_config.cache_clear()
+
+        assert get_config() is not first
+        assert get_config().app_password == "changed"
+
+    def test_config_is_immutable(self):
+        """Test that config values cannot be reassigned"""
+        with pytest.raises(FrozenInstanceError):
+            get_config().app_password = "other"
+
+
+class TestLLMProviderSelection:
+    """Test that only the selected provider's API key is required"""
+
+    @pytest.fixture(autouse=True)
+    def base_env(self, monkeypatch):
+        """Set all required vars except the LLM API keys"""
+        for key in ["SENTRY_AUTH_TOKEN", "SENTRY_ORG", "SENTRY_PROJECT",
+                    "SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "APP_PASSWORD"]:
+            monkeypatch.setenv(key, "test")
+        for key in ["LLM_PROVIDER", "GEMINI_API_KEY", "OPENAI_API_KEY"]:
+            monkeypatch.delenv(key, raising=False)
+
+    def test_defaults_to_gemini(self, monkeypatch):
+        """Test that Gemini is used when LLM_PROVIDER is not set"""
+        monkeypatch.setenv("GEMINI_API_KEY", "test-gemini")
+
+        assert Config().llm_provider == "gemini"
+
+    def test_openai_requires_only_openai_key(self, monkeypatch):
+        """Test that the OpenAI provider doesn't need a Gemini key"""
+        monkeypatch.setenv("LLM_PROVIDER", "openai")
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+
+        config = Config()
+        assert config.openai_api_key == "sk-test"
+
+    def test_missing_provider_key_raises(self, monkeypatch):
+        """Test that the selected provider's key is validated"""
+        monkeypatch.setenv("LLM_PROVIDER", "openai")
+        monkeypatch.setenv("GEMINI_API_KEY", "test-gemini")
+
+        with pytest.raises(ValueError, match="OPENAI_API_KEY"):
+            Config()
+
+    def test_unknown_provider_raises(self, monkeypatch):
+        """Test that an unsupported provider name is rejected"""
+        monkeypatch.setenv("LLM_PROVIDER", "other")
+
+        with pytest.raises(ValueError, match="Unsupported LLM_PROVIDER"):
+            Config()
+
+
+
+class TestOptionalSettings:
+    """Test parsing of the optional performance settings"""
+
+    @pytest.fixture(autouse=True)
+    def base_env(self, monkeypatch):
+        """Set all required vars"""
+        for key in ["SENTRY_AUTH_TOKEN", "SENTRY_ORG", "SENTRY_PROJECT", "GEMINI_API_KEY",
+                    "SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "APP_PASSWORD"]:
+            monkeypatch.setenv(key, "test")
+
+    def test_flags_are_off_by_default(self, monkeypatch):
+        """Test that optional caches stay disabled unless switched on"""
+        monkeypatch.delenv("SEMANTIC_CACHE_ENABLED", raising=False)
+        monkeypatch.delenv("GEMINI_CONTEXT_CACHE_ENABLED", raising=False)
+        monkeypatch.delenv("SENTRY_WINDOW_BATCHING_ENABLED", raising=False)
+        monkeypatch.delenv("LLM_WARM_PROMPT_CACHE", raising=False)
+
+        config = Config()
+        assert config.semantic_cache_enabled is False
+        assert config.gemini_context_cache_enabled is False
+        assert config.sentry_window_batching_enabled is False
+        assert config.llm_warm_prompt_cache is False
+
+    def test_flags_enabled_by_true(self, monkeypatch):
+        """Test that a flag is enabled by "true" in any case"""
+        monkeypatch.setenv("SEMANTIC_CACHE_ENABLED", "TRUE")
+
+        assert Config().semantic_cache_enabled is True
+
+
+    def test_max_concurrency_parsed(self, monkeypatch):
+        """Test that LLM_MAX_CONCURRENCY is read as an integer with a default"""
+        monkeypatch.delenv("LLM_MAX_CONCURRENCY", raising=False)
+        assert Config().llm_max_concurrency == 8
+
+        monkeypatch.setenv("LLM_MAX_CONCURRENCY", "3")
+        assert Config().llm_max_concurrency == 3
+
+    @pytest.mark.parametrize("value", ["abc", "2.5", "0"])
+    def test_invalid_max_concurrency_raises(self, monkeypatch, value):
+        """Test that a malformed or non-positive limit names the variable"""
+        monkeypatch.setenv("LLM_MAX_CONCURRENCY", value)
+
+        with pytest.raises(ValueError, match="LLM_MAX_CONCURRENCY must be an integer >= 1"):
+            Config()
+
+
+    def test_sentry_cache_ttls_parsed(self, monkeypatch):
+        """Test that the Sentry cache TTLs are read as seconds with defaults"""
+        monkeypatch.delenv("SENTRY_CACHE_TTL_SECONDS", raising=False)
+        monkeypatch.setenv("SENTRY_CACHE_RECENT_TTL_SECONDS", "2.5")
+
+        config = Config()
+        assert config.sentry_cache_ttl_seconds == 300
+        assert config.sentry_cache_recent_ttl_seconds == 2.5
+
+    @pytest.mark.parametrize("value", ["5m", "-1", "nan"])
+    def test_invalid_sentry_cache_ttl_raises(self, monkeypatch, value):
+        """Test that a malformed or negative TTL names the variable"""
+        monkeypatch.setenv("SENTRY_CACHE_TTL_SECONDS", value)
+
+        with pytest.raises(ValueError, match="SENTRY_CACHE_TTL_SECONDS must be a number >= 0"):
+            Config()
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
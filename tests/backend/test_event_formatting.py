@@ -3,41 +3,46 @@ Tests for Sentry Event Formatting
 Testing Task 3.2: Format Sentry Events for LLM
 """
 
-import os
 import pytest
 from unittest.mock import patch
 
+from config import Config
 from sentry_client import (
     format_events_for_llm,
     generate_sentry_link,
+    generate_sentry_links,
     _extract_stack_trace,
     _extract_breadcrumbs,
 )
 
 
-@pytest.fixture
-def mock_config():
-    """Mock config with test values"""
-    with patch.dict(
-        os.environ,
-        {
-            "SENTRY_AUTH_TOKEN": "test-token-123",
-            "SENTRY_ORG": "test-org",
-            "SENTRY_PROJECT": "test-project",
-            "OPENAI_API_KEY": "test-openai-key",
-            "SLACK_BOT_TOKEN": "test-slack-token",
-            "SLACK_SIGNING_SECRET": "test-slack-secret",
-            "APP_PASSWORD": "test-password",
-            "ALLOWED_ORIGINS": "*",
-        },
-    ):
-        # Reset global config
-        import config as config_module
-        config_module.config = None
-        yield
+@pytest.fixture(scope="module")
+def test_config():
+    """Config with test values, built once for the module"""
+    return Config(
+        sentry_auth_token="test-token-123",
+        sentry_org="test-org",
+        sentry_project="test-project",
+        llm_provider="gemini",
+        gemini_api_key="test-gemini-key",
+        openai_api_key="test-openai-key",
+        slack_bot_token="test-slack-token",
+        slack_signing_secret="test-slack-secret",
+        app_password="test-password",
+        allowed_origins="*",
+    )
 
 
 @pytest.fixture
+def mock_config(test_config):
+    """Serve the test config to sentry_client without rebuilding it from the environment"""
+    with patch("sentry_client.get_config", return_value=test_config):
+        yield test_config
+
+
+# Event fixtures are read-only test data, so they're built once per module
+
+@pytest.fixture(scope="module")
 def minimal_event():
     """Minimal Sentry event with only required fields"""
     return {
@@ -47,7 +52,7 @@ def minimal_event():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def complete_event():
     """Complete Sentry event with all fields populated"""
     return {
@@ -139,7 +144,7 @@ def complete_event():
     }
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def event_without_stack():
     """Event with breadcrumbs but no stack trace"""
     return {
@@ -190,6 +195,42 @@ class TestGenerateSentryLink:
         assert "custom-project" in link
         assert event_id in link
 
+    def test_generate_links_skips_events_without_id(self, mock_config):
+        """Test bulk link generation keeps event order and skips missing IDs"""
+        events = [{"id": "first"}, {"title": "No ID"}, {"id": ""}, {"id": "second"}]
+
+        links = generate_sentry_links(events)
+
+        assert links == [generate_sentry_link("first"), generate_sentry_link("second")]
+
+
+# Everything format_events_for_llm should render for complete_event
+COMPLETE_EVENT_EXPECTED = (
+    # Timestamp
+    "Time: 2025-01-19T14:30:15Z",
+    # Error type and message
+    "PaymentTokenExpiredError",
+    "Token expired after 10 minutes of inactivity",
+    # Stack trace
+    "Stack Trace:",
+    "payment_service.py:42",
+    "process_payment()",
+    "raise PaymentTokenExpiredError('Token expired')",
+    "checkout_handler.py:128",
+    # Breadcrumbs
+    "Breadcrumbs",
+    "User navigated to /checkout",
+    "Clicked 'Complete Purchase' button",
+    # Context tags
+    "Context:",
+    "environment=production",
+    "release=v1.2.3",
+    # Sentry link
+    "Link:",
+    "https://sentry.io",
+    "event-complete-456",
+)
+
 
 class TestFormatEventsForLLM:
     """Test main event formatting function"""
@@ -213,34 +254,8 @@ class TestFormatEventsForLLM:
         """Test formatting event with all fields populated"""
         result = format_events_for_llm([complete_event])
 
-        # Check timestamp
-        assert "Time: 2025-01-19T14:30:15Z" in result
-
-        # Check error type and message
-        assert "PaymentTokenExpiredError" in result
-        assert "Token expired after 10 minutes of inactivity" in result
-
-        # Check stack trace
-        assert "Stack Trace:" in result
-        assert "payment_service.py:42" in result
-        assert "process_payment()" in result
-        assert "raise PaymentTokenExpiredError('Token expired')" in result
-        assert "checkout_handler.py:128" in result
-
-        # Check breadcrumbs
-        assert "Breadcrumbs" in result
-        assert "User navigated to /checkout" in result
-        assert "Clicked 'Complete Purchase' button" in result
-
-        # Check context tags
-        assert "Context:" in result
-        assert "environment=production" in result
-        assert "release=v1.2.3" in result
-
-        # Check Sentry link
-        assert "Link:" in result
-        assert "https://sentry.io" in result
-        assert "event-complete-456" in result
+        missing = [expected for expected in COMPLETE_EVENT_EXPECTED if expected not in result]
+        assert not missing, missing
 
     def test_format_event_without_stack(self, mock_config, event_without_stack):
         """Test formatting event without stack trace"""
@@ -285,28 +300,37 @@ class TestFormatEventsForLLM:
         # Should handle missing timestamp gracefully
         assert "Time:" in result
 
+    def test_format_events_without_id_skips_config(self):
+        """Test that events without IDs are formatted without loading config"""
+        with patch("sentry_client.get_config", side_effect=ValueError("no config")) as mock_get_config:
+            result = format_events_for_llm([{"title": "Simple Error"}])
+
+        assert "Simple Error" in result
+        assert "Link:" not in result
+        mock_get_config.assert_not_called()
+
 
 class TestExtractStackTrace:
     """Test stack trace extraction"""
 
     def test_extract_stack_from_complete_event(self, complete_event):
         """Test extracting stack trace from complete event"""
-        frames = _extract_stack_trace(complete_event)
+        frames, total_frames = _extract_stack_trace(complete_event)
 
-        assert len(frames) == 2
+        assert len(frames) == total_frames == 2
         assert "payment_service.py:42 in process_payment()" in frames[0]
         assert "raise PaymentTokenExpiredError('Token expired')" in frames[0]
         assert "checkout_handler.py:128 in handle_checkout()" in frames[1]
 
     def test_extract_stack_from_event_without_stack(self, event_without_stack):
         """Test extracting stack trace from event without stack"""
-        frames = _extract_stack_trace(event_without_stack)
+        frames, _ = _extract_stack_trace(event_without_stack)
         assert frames == []
 
     def test_extract_stack_handles_missing_entries(self):
         """Test stack extraction with missing entries field"""
         event = {"id": "test", "title": "Error"}
-        frames = _extract_stack_trace(event)
+        frames, _ = _extract_stack_trace(event)
         assert frames == []
 
     def test_extract_stack_handles_no_context(self):
@@ -335,12 +359,26 @@ class TestExtractStackTrace:
             ]
         }
 
-        frames = _extract_stack_trace(event)
+        frames, _ = _extract_stack_trace(event)
         assert len(frames) == 1
         assert "test.py:10 in test_func()" in frames[0]
         # Should not include code line if context missing
         assert "->" not in frames[0]
 
+    def test_extract_stack_formats_only_max_frames(self):
+        """Test that frames past max_frames are counted but not formatted"""
+        raw_frames = [{"filename": f"file{i}.py", "function": "f", "lineNo": i} for i in range(8)]
+        event = {
+            "entries": [
+                {"type": "exception", "data": {"values": [{"stacktrace": {"frames": raw_frames}}]}}
+            ]
+        }
+
+        frames, total_frames = _extract_stack_trace(event, max_frames=3)
+
+        assert frames == [f"file{i}.py:{i} in f()" for i in range(3)]
+        assert total_frames == 8
+
 
 class TestExtractBreadcrumbs:
     """Test breadcrumb extraction"""
@@ -432,7 +470,8 @@ class TestExtractBreadcrumbs:
 class TestStackTraceTruncation:
     """Test that long stack traces are truncated properly"""
 
-    def test_long_stack_trace_truncated(self, mock_config):
+    @pytest.mark.parametrize("n_frames", [5, 6, 10, 50])
+    def test_long_stack_trace_truncated(self, mock_config, n_frames):
         """Test that stack traces longer than 5 frames are truncated"""
         event = {
             "id": "long-stack",
@@ -451,7 +490,7 @@ class TestStackTraceTruncation:
                                             "function": f"func{i}",
                                             "lineNo": i * 10
                                         }
-                                        for i in range(10)  # 10 frames
+                                        for i in range(n_frames)
                                     ]
                                 }
                             }
@@ -463,21 +502,24 @@ class TestStackTraceTruncation:
 
         result = format_events_for_llm([event])
 
-        # Should show first 5 frames
+        # Should show the first 5 frames
+        shown = min(n_frames, 5)
         assert "file0.py:0" in result
-        assert "file4.py:40" in result
-
-        # Should not show frames 5-9
-        assert "file9.py:90" not in result
+        assert f"file{shown - 1}.py:{(shown - 1) * 10}" in result
 
-        # Should indicate truncation
-        assert "(5 more frames)" in result
+        if n_frames > 5:
+            # Should not show the rest, but say how many were cut
+            assert f"file{n_frames - 1}.py:{(n_frames - 1) * 10}" not in result
+            assert f"({n_frames - 5} more frames)" in result
+        else:
+            assert "more frames" not in result
 
 
 class TestBreadcrumbTruncation:
     """Test that long breadcrumb lists show only last 5"""
 
-    def test_many_breadcrumbs_shows_last_five(self, mock_config):
+    @pytest.mark.parametrize("n_crumbs", [5, 6, 10, 50])
+    def test_many_breadcrumbs_shows_last_five(self, mock_config, n_crumbs):
         """Test that only the last 5 breadcrumbs are shown"""
         event = {
             "id": "many-crumbs",
@@ -493,7 +535,7 @@ class TestBreadcrumbTruncation:
                                 "message": f"Action {i}",
                                 "level": "info"
                             }
-                            for i in range(10)  # 10 breadcrumbs
+                            for i in range(n_crumbs)
                         ]
                     }
                 }
@@ -502,10 +544,10 @@ class TestBreadcrumbTruncation:
 
         result = format_events_for_llm([event])
 
-        # Should show last 5 (indices 5-9)
-        assert "Action 5" in result
-        assert "Action 9" in result
+        # Should show the last 5
+        assert f"Action {n_crumbs - 5}" in result
+        assert f"Action {n_crumbs - 1}" in result
 
-        # Should not show first ones (indices 0-4)
-        assert "Action 0" not in result
-        assert "Action 4" not in result
+        # Should not show the one before them
+        if n_crumbs > 5:
+            assert f"Action {n_crumbs - 6}" not in result
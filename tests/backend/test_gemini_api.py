@@ -0,0 +1,343 @@
+"""
+Tests for Gemini API calls in the LLM analyzer
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from analyzer import (
+    analyze_logs,
+    clear_llm_cache,
+    _call_gemini_api,
+    _max_output_tokens,
+    _get_gemini_client,
+    warm_prompt_cache,
+    LLMAPIError,
+    LLMResponseFormatError,
+    SYSTEM_PROMPT,
+)
+
+
+VALID_LLM_RESPONSE = {
+    "causes": [
+        {"rank": 1, "cause": "Payment token expired", "explanation": "Took too long", "confidence": "high"},
+        {"rank": 2, "cause": "Session timeout", "explanation": "Session expired", "confidence": "medium"},
+        {"rank": 3, "cause": "Network interruption", "explanation": "Connection lost", "confidence": "low"},
+    ],
+    "suggested_response": "Please try again.",
+    "logs_summary": "Found PaymentTokenExpiredError",
+}
+
+ANALYZE_KWARGS = {
+    "description": "User can't complete checkout",
+    "timestamp": "2025-01-19T14:30:00Z",
+    "customer_id": "usr_test123",
+    "formatted_events": "Event 1:\n- Error: PaymentTokenExpiredError",
+    "workflow_docs": "# Checkout Flow",
+    "known_errors": "# Payment Token Expired",
+}
+
+
+def _chunk(text, finish_reason=None):
+    """Build a fake streamed Gemini response chunk"""
+    candidate = MagicMock(finish_reason=finish_reason)
+    return MagicMock(text=text, candidates=[candidate])
+
+
+def _cached_content(name):
+    """Build a fake Gemini CachedContent object"""
+    cached = MagicMock()
+    cached.name = name
+    return cached
+
+
+def _mock_client(chunks):
+    """Build a fake Gemini client that streams the given chunks"""
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    client = MagicMock()
+    client.aio.models.generate_content_stream = AsyncMock(return_value=stream())
+    return client
+
+
+@pytest.mark.asyncio
+class TestCallGeminiAPI:
+    """Test streamed Gemini API calls"""
+
+    async def test_chunks_are_accumulated(self):
+        """Test that streamed chunks are joined into the full response"""
+        client = _mock_client([_chunk('{"test": '), _chunk('"response"}', finish_reason="STOP")])
+
+        result = await _call_gemini_api(client, "prompt")
+
+        assert result == '{"test": "response"}'
+        client.aio.models.generate_content_stream.assert_called_once()
+
+    async def test_chunks_without_text_are_skipped(self):
+        """Test that chunks carrying no text don't affect the response"""
+        client = _mock_client([_chunk("a"), _chunk(None), _chunk("b", finish_reason="STOP")])
+
+        result = await _call_gemini_api(client, "prompt")
+
+        assert result == "ab"
+
+    async def test_incomplete_response_still_returned(self):
+        """Test that a non-STOP finish reason is logged but not fatal"""
+        client = _mock_client([_chunk('{"partial": true}', finish_reason="MAX_TOKENS")])
+
+        result = await _call_gemini_api(client, "prompt")
+
+        assert result == '{"partial": true}'
+
+    async def test_cached_content_passed_to_config(self):
+        """Test that the context cache name is sent with the request"""
+        client = _mock_client([_chunk("{}", finish_reason="STOP")])
+
+        await _call_gemini_api(client, "prompt", cached_content="cachedContents/abc")
+
+        config = client.aio.models.generate_content_stream.call_args[1]["config"]
+        assert config.cached_content == "cachedContents/abc"
+
+    async def test_output_is_capped_json(self):
+        """Test that the token cap is sent and output is constrained to JSON"""
+        client = _mock_client([_chunk("{}", finish_reason="STOP")])
+
+        await _call_gemini_api(client, "prompt", max_output_tokens=900)
+
+        config = client.aio.models.generate_content_stream.call_args[1]["config"]
+        assert config.max_output_tokens == 900
+        assert config.response_mime_type == "application/json"
+
+    @pytest.mark.parametrize("events_length, expected", [
+        (0, 800),
+        (400, 900),
+        (100_000, 1500),
+    ])
+    async def test_max_output_tokens_scales_with_events(self, events_length, expected):
+        """Test that the token cap grows with the log context up to the ceiling"""
+        assert _max_output_tokens("x" * events_length) == expected
+
+    async def test_failed_attempts_are_retried(self):
+        """Test that API errors are retried with backoff until one succeeds"""
+        client = MagicMock()
+        client.aio.models.generate_content_stream = AsyncMock(side_effect=[
+            Exception("unavailable"),
+            _mock_client([_chunk("{}", finish_reason="STOP")]).aio.models.generate_content_stream.return_value,
+        ])
+
+        with patch("analyzer.asyncio.sleep", new=AsyncMock()) as mock_sleep:
+            result = await _call_gemini_api(client, "prompt")
+
+        assert result == "{}"
+        assert client.aio.models.generate_content_stream.call_count == 2
+        mock_sleep.assert_awaited_once()
+        assert 2 <= mock_sleep.call_args[0][0] <= 2.5
+
+    async def test_gives_up_after_max_attempts(self):
+        """Test that the last API error is raised once retries are exhausted"""
+        client = MagicMock()
+        client.aio.models.generate_content_stream = AsyncMock(side_effect=Exception("unavailable"))
+
+        with patch("analyzer.asyncio.sleep", new=AsyncMock()) as mock_sleep:
+            with pytest.raises(LLMAPIError):
+                await _call_gemini_api(client, "prompt")
+
+        assert client.aio.models.generate_content_stream.call_count == 3
+        assert mock_sleep.await_count == 2
+
+
+@pytest.mark.asyncio
+class TestContextCache:
+    """Test Gemini context caching of the static prompt prefix"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Enable context caching and patch config/client"""
+        clear_llm_cache()
+
+        mock_config = MagicMock()
+        mock_config.gemini_api_key = "test-key"
+        mock_config.semantic_cache_enabled = False
+        mock_config.gemini_context_cache_enabled = True
+        mock_config.llm_max_concurrency = 8
+        mock_config.llm_warm_prompt_cache = False
+        self.config = mock_config
+
+        with patch("analyzer.get_config", return_value=mock_config), \
+                patch("analyzer.genai") as mock_genai, \
+                patch("analyzer._gemini_client", None):
+            self.client = mock_genai.Client.return_value
+            yield
+
+        clear_llm_cache()
+
+    async def test_static_prefix_cached_once(self):
+        """Test that the cache is created once and only the request part is sent"""
+        self.client.aio.caches.create = AsyncMock(return_value=_cached_content("cachedContents/abc"))
+        mock_call = AsyncMock(return_value=json.dumps(VALID_LLM_RESPONSE))
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            await analyze_logs(**ANALYZE_KWARGS)
+            await analyze_logs(**{**ANALYZE_KWARGS, "description": "Another problem"})
+
+        self.client.aio.caches.create.assert_called_once()
+        cache_config = self.client.aio.caches.create.call_args[1]["config"]
+        assert cache_config.system_instruction == SYSTEM_PROMPT
+
+        _, prompt, cache_name = mock_call.call_args[0]
+        assert cache_name == "cachedContents/abc"
+        assert "Another problem" in prompt
+        assert ANALYZE_KWARGS["workflow_docs"] not in prompt
+
+    async def test_concurrent_first_requests_create_cache_once(self):
+        """Test that concurrent requests before the cache exists share one creation"""
+        async def slow_create(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            return _cached_content("cachedContents/abc")
+
+        self.client.aio.caches.create = AsyncMock(side_effect=slow_create)
+        mock_call = AsyncMock(return_value=json.dumps(VALID_LLM_RESPONSE))
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            await asyncio.gather(*[
+                analyze_logs(**{**ANALYZE_KWARGS, "description": f"Problem {i}"})
+                for i in range(3)
+            ])
+
+        self.client.aio.caches.create.assert_called_once()
+        assert all(call[0][2] == "cachedContents/abc" for call in mock_call.call_args_list)
+
+    async def test_warm_prompt_cache_creates_cache_ahead_of_requests(self):
+        """Test that startup warming creates the cache the first analysis then reuses"""
+        self.config.llm_warm_prompt_cache = True
+        self.client.aio.caches.create = AsyncMock(return_value=_cached_content("cachedContents/abc"))
+        mock_call = AsyncMock(return_value=json.dumps(VALID_LLM_RESPONSE))
+
+        await warm_prompt_cache(ANALYZE_KWARGS["workflow_docs"], ANALYZE_KWARGS["known_errors"])
+        self.client.aio.caches.create.assert_called_once()
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            await analyze_logs(**ANALYZE_KWARGS)
+
+        self.client.aio.caches.create.assert_called_once()
+        assert mock_call.call_args[0][2] == "cachedContents/abc"
+
+    async def test_warm_prompt_cache_disabled_by_default(self):
+        """Test that nothing is sent to the API unless warming is enabled"""
+        self.client.aio.caches.create = AsyncMock()
+
+        await warm_prompt_cache(ANALYZE_KWARGS["workflow_docs"], ANALYZE_KWARGS["known_errors"])
+
+        self.client.aio.caches.create.assert_not_called()
+
+    async def test_creation_failure_falls_back_to_full_prompt(self):
+        """Test that a failed cache creation is remembered and the full prompt is sent"""
+        self.client.aio.caches.create = AsyncMock(side_effect=Exception("too small"))
+        mock_call = AsyncMock(return_value=json.dumps(VALID_LLM_RESPONSE))
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            await analyze_logs(**ANALYZE_KWARGS)
+            await analyze_logs(**{**ANALYZE_KWARGS, "description": "Another problem"})
+
+        self.client.aio.caches.create.assert_called_once()
+        _, prompt, cache_name = mock_call.call_args[0]
+        assert cache_name is None
+        assert ANALYZE_KWARGS["workflow_docs"] in prompt
+
+
+@pytest.mark.asyncio
+class TestAnalyzeLogs:
+    """Test analyze_logs against a mocked Gemini API"""
+
+    @pytest.fixture(autouse=True)
+    def setup(self):
+        """Patch config/client and start with empty caches"""
+        clear_llm_cache()
+
+        mock_config = MagicMock()
+        mock_config.gemini_api_key = "test-key"
+        mock_config.semantic_cache_enabled = False
+        mock_config.gemini_context_cache_enabled = False
+        mock_config.llm_max_concurrency = 8
+        self.config = mock_config
+
+        with patch("analyzer.get_config", return_value=mock_config), \
+                patch("analyzer.genai"), \
+                patch("analyzer._gemini_client", None):
+            yield
+
+        clear_llm_cache()
+
+    @pytest.mark.parametrize("template", [
+        "{body}",
+        "```json\n{body}\n```",
+        "```\n{body}\n```",
+        "  ```json{body}```  ",
+    ])
+    async def test_markdown_fences_are_stripped(self, template):
+        """Test that fenced and unfenced JSON responses both parse"""
+        content = template.format(body=json.dumps(VALID_LLM_RESPONSE))
+
+        with patch("analyzer._call_gemini_api", new=AsyncMock(return_value=content)):
+            result = await analyze_logs(**ANALYZE_KWARGS)
+
+        assert result == VALID_LLM_RESPONSE
+
+    @pytest.mark.parametrize("content", ["[]", '"text"', "null"])
+    async def test_non_object_json_is_rejected(self, content):
+        """Test that valid JSON which isn't an object is a format error"""
+        with patch("analyzer._call_gemini_api", new=AsyncMock(return_value=content)):
+            with pytest.raises(LLMResponseFormatError):
+                await analyze_logs(**ANALYZE_KWARGS)
+
+    async def test_concurrent_calls_are_limited(self):
+        """Test that bursts of analyses never exceed the concurrency limit"""
+        active = 0
+        max_active = 0
+
+        async def slow_call(*args, **kwargs):
+            nonlocal active, max_active
+            active += 1
+            max_active = max(max_active, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            return json.dumps(VALID_LLM_RESPONSE)
+
+        self.config.llm_max_concurrency = 2
+
+        with patch("analyzer._call_gemini_api", new=slow_call), \
+                patch("analyzer._llm_semaphore", None):
+            results = await asyncio.gather(*[
+                analyze_logs(**{**ANALYZE_KWARGS, "description": f"Problem {i}"})
+                for i in range(5)
+            ])
+
+        assert len(results) == 5
+        assert max_active == 2
+
+
+class TestGeminiClientReuse:
+    """Test that the Gemini client is shared across requests"""
+
+    def test_client_created_once(self):
+        """Test that repeated lookups reuse the same client"""
+        with patch("analyzer.genai") as mock_genai, \
+                patch("analyzer._gemini_client", None):
+            first = _get_gemini_client("test-key")
+            second = _get_gemini_client("test-key")
+
+        assert first is second
+        mock_genai.Client.assert_called_once_with(api_key="test-key")
+
+    def test_client_rebuilt_when_key_changes(self):
+        """Test that a new API key gets a new client"""
+        with patch("analyzer.genai") as mock_genai, \
+                patch("analyzer._gemini_client", None):
+            _get_gemini_client("key-1")
+            _get_gemini_client("key-2")
+
+        assert mock_genai.Client.call_count == 2
@@ -0,0 +1,289 @@
+"""
+Tests for the LLM response cache
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from analyzer import (
+    analyze_logs,
+    clear_llm_cache,
+    LLMAPIError,
+    LLMCache,
+    LLMResponseFormatError,
+    SemanticCache,
+)
+
+
+VALID_LLM_RESPONSE = {
+    "causes": [
+        {"rank": 1, "cause": "Payment token expired", "explanation": "Took too long", "confidence": "high"},
+        {"rank": 2, "cause": "Session timeout", "explanation": "Session expired", "confidence": "medium"},
+        {"rank": 3, "cause": "Network interruption", "explanation": "Connection lost", "confidence": "low"},
+    ],
+    "suggested_response": "Please try again.",
+    "logs_summary": "Found PaymentTokenExpiredError",
+}
+
+ANALYZE_KWARGS = {
+    "description": "User can't complete checkout",
+    "timestamp": "2025-01-19T14:30:00Z",
+    "customer_id": "usr_test123",
+    "formatted_events": "Event 1:\n- Error: PaymentTokenExpiredError",
+    "workflow_docs": "# Checkout Flow",
+    "known_errors": "# Payment Token Expired",
+}
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    """Start every test with an empty cache"""
+    clear_llm_cache()
+    yield
+    clear_llm_cache()
+
+
+@pytest.fixture
+def mock_config():
+    """Gemini config with the optional caches switched off"""
+    return MagicMock(
+        gemini_api_key="test-key",
+        semantic_cache_enabled=False,
+        gemini_context_cache_enabled=False,
+        llm_max_concurrency=8,
+    )
+
+
+@pytest.fixture
+def mock_gemini(mock_config):
+    """Patch config and Gemini client so no real API calls are made"""
+    with patch("analyzer.get_config", return_value=mock_config), \
+            patch("analyzer.genai") as mock_genai, \
+            patch("analyzer._gemini_client", None):
+        yield mock_genai.Client.return_value
+
+
+def _embedding_response(values):
+    """Build a fake Gemini embed_content response"""
+    return MagicMock(embeddings=[MagicMock(values=values)])
+
+
+class TestLLMCache:
+    """Test the cache container itself"""
+
+    def test_key_is_deterministic(self):
+        """Test that identical inputs produce identical keys"""
+        assert LLMCache.make_key("model", "prompt") == LLMCache.make_key("model", "prompt")
+
+    def test_key_depends_on_model_and_prompt(self):
+        """Test that model and prompt both contribute to the key"""
+        key = LLMCache.make_key("model", "prompt")
+        assert key != LLMCache.make_key("other-model", "prompt")
+        assert key != LLMCache.make_key("model", "other prompt")
+
+    def test_get_missing_key(self):
+        """Test that missing keys return None"""
+        assert LLMCache().get("missing") is None
+
+    def test_expired_entry_is_dropped(self):
+        """Test that entries past their TTL are treated as misses"""
+        cache = LLMCache(ttl_seconds=0)
+        cache.set("key", "value")
+        assert cache.get("key") is None
+
+    def test_oldest_entry_evicted_when_full(self):
+        """Test that the cache never grows beyond max_entries"""
+        cache = LLMCache(max_entries=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.set("c", "3")
+
+        assert cache.get("a") is None
+        assert cache.get("b") == "2"
+        assert cache.get("c") == "3"
+
+
+@pytest.mark.asyncio
+class TestAnalyzeLogsCaching:
+    """Test that analyze_logs uses the cache"""
+
+    async def test_identical_requests_call_llm_once(self, mock_gemini):
+        """Test that a repeated request is served from the cache"""
+        mock_call = AsyncMock(return_value=json.dumps(VALID_LLM_RESPONSE))
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            first = await analyze_logs(**ANALYZE_KWARGS)
+            second = await analyze_logs(**ANALYZE_KWARGS)
+
+        assert first == second == VALID_LLM_RESPONSE
+        assert mock_call.call_count == 1
+
+    async def test_cache_hit_skips_validation(self, mock_gemini):
+        """Test that a cached response is parsed again but not re-validated"""
+        fenced = "```json\n" + json.dumps(VALID_LLM_RESPONSE) + "\n```"
+
+        with patch("analyzer._call_gemini_api", new=AsyncMock(return_value=fenced)):
+            first = await analyze_logs(**ANALYZE_KWARGS)
+            with patch("analyzer._validate_llm_response") as mock_validate:
+                second = await analyze_logs(**ANALYZE_KWARGS)
+
+        mock_validate.assert_not_called()
+        assert second == first == VALID_LLM_RESPONSE
+        assert second is not first
+
+    async def test_different_requests_are_not_shared(self, mock_gemini):
+        """Test that a different prompt misses the cache"""
+        mock_call = AsyncMock(return_value=json.dumps(VALID_LLM_RESPONSE))
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            await analyze_logs(**ANALYZE_KWARGS)
+            await analyze_logs(**{**ANALYZE_KWARGS, "customer_id": "usr_other"})
+
+        assert mock_call.call_count == 2
+
+    async def test_concurrent_identical_requests_share_one_call(self, mock_gemini):
+        """Test that identical requests in flight together make a single LLM call"""
+        calls = 0
+
+        async def slow_call(*args, **kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return json.dumps(VALID_LLM_RESPONSE)
+
+        with patch("analyzer._call_gemini_api", new=slow_call):
+            results = await asyncio.gather(*[analyze_logs(**ANALYZE_KWARGS) for _ in range(3)])
+
+        assert results == [VALID_LLM_RESPONSE] * 3
+        assert calls == 1
+
+    async def test_cancelled_first_caller_does_not_cancel_others(self, mock_gemini):
+        """Test that a caller leaving early doesn't cancel the shared call"""
+        calls = 0
+
+        async def slow_call(*args, **kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return json.dumps(VALID_LLM_RESPONSE)
+
+        with patch("analyzer._call_gemini_api", new=slow_call):
+            first = asyncio.create_task(analyze_logs(**ANALYZE_KWARGS))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(analyze_logs(**ANALYZE_KWARGS))
+            await asyncio.sleep(0.005)
+            first.cancel()
+
+            assert await second == VALID_LLM_RESPONSE
+
+        assert first.cancelled()
+        assert calls == 1
+
+    async def test_in_flight_failure_reaches_all_callers(self, mock_gemini):
+        """Test that callers sharing an in-flight call all see its error"""
+        async def failing_call(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            raise LLMAPIError("boom")
+
+        with patch("analyzer._call_gemini_api", new=failing_call):
+            results = await asyncio.gather(
+                *[analyze_logs(**ANALYZE_KWARGS) for _ in range(2)],
+                return_exceptions=True,
+            )
+
+        assert all(isinstance(result, LLMAPIError) for result in results)
+
+    async def test_invalid_responses_are_not_cached(self, mock_gemini):
+        """Test that responses failing validation are retried on the next call"""
+        mock_call = AsyncMock(return_value="Not valid JSON{")
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            for _ in range(2):
+                with pytest.raises(LLMResponseFormatError):
+                    await analyze_logs(**ANALYZE_KWARGS)
+
+        assert mock_call.call_count == 2
+
+
+class TestSemanticCache:
+    """Test the semantic cache container"""
+
+    def test_similar_embedding_hits(self):
+        """Test that a near-identical embedding in the same scope is a hit"""
+        cache = SemanticCache(threshold=0.9)
+        cache.add("scope", [1.0, 0.0], VALID_LLM_RESPONSE)
+
+        assert cache.get("scope", [0.99, 0.05]) == VALID_LLM_RESPONSE
+
+    def test_dissimilar_embedding_misses(self):
+        """Test that an unrelated embedding is a miss"""
+        cache = SemanticCache(threshold=0.9)
+        cache.add("scope", [1.0, 0.0], VALID_LLM_RESPONSE)
+
+        assert cache.get("scope", [0.0, 1.0]) is None
+
+    def test_other_scope_misses(self):
+        """Test that entries are only compared within the same scope"""
+        cache = SemanticCache(threshold=0.9)
+        cache.add("scope", [1.0, 0.0], VALID_LLM_RESPONSE)
+
+        assert cache.get("other-scope", [1.0, 0.0]) is None
+
+    def test_scope_key_buckets_timestamps(self):
+        """Test that timestamps in the same 5-minute window share a scope"""
+        cache = SemanticCache()
+        key = cache.make_scope_key("usr_1", "2025-01-19T14:31:00Z", "docs", "errors")
+
+        assert key == cache.make_scope_key("usr_1", "2025-01-19T14:34:59Z", "docs", "errors")
+        assert key != cache.make_scope_key("usr_1", "2025-01-19T14:35:00Z", "docs", "errors")
+        assert key != cache.make_scope_key("usr_2", "2025-01-19T14:31:00Z", "docs", "errors")
+
+    def test_scope_key_changes_with_docs(self):
+        """Test that editing the knowledge base invalidates the scope"""
+        cache = SemanticCache()
+        key = cache.make_scope_key("usr_1", "2025-01-19T14:31:00Z", "docs", "errors")
+
+        assert key != cache.make_scope_key("usr_1", "2025-01-19T14:31:00Z", "new docs", "errors")
+
+
+@pytest.mark.asyncio
+class TestAnalyzeLogsSemanticCaching:
+    """Test that analyze_logs uses the semantic cache when enabled"""
+
+    async def test_paraphrased_request_served_from_cache(self, mock_gemini, mock_config):
+        """Test that a paraphrased description reuses the earlier analysis"""
+        mock_config.semantic_cache_enabled = True
+        mock_gemini.aio.models.embed_content = AsyncMock(
+            side_effect=[_embedding_response([1.0, 0.0]), _embedding_response([0.98, 0.1])]
+        )
+        mock_call = AsyncMock(return_value=json.dumps(VALID_LLM_RESPONSE))
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            await analyze_logs(**ANALYZE_KWARGS)
+            result = await analyze_logs(**{**ANALYZE_KWARGS, "description": "Checkout is broken"})
+
+        assert result == VALID_LLM_RESPONSE
+        assert mock_call.call_count == 1
+
+    async def test_disabled_by_default(self, mock_gemini):
+        """Test that no embeddings are requested unless enabled"""
+        mock_gemini.aio.models.embed_content = AsyncMock()
+        mock_call = AsyncMock(return_value=json.dumps(VALID_LLM_RESPONSE))
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            await analyze_logs(**ANALYZE_KWARGS)
+
+        mock_gemini.aio.models.embed_content.assert_not_called()
+
+    async def test_embedding_failure_falls_back_to_llm(self, mock_gemini, mock_config):
+        """Test that an embedding error does not fail the analysis"""
+        mock_config.semantic_cache_enabled = True
+        mock_gemini.aio.models.embed_content = AsyncMock(side_effect=Exception("boom"))
+        mock_call = AsyncMock(return_value=json.dumps(VALID_LLM_RESPONSE))
+
+        with patch("analyzer._call_gemini_api", new=mock_call):
+            result = await analyze_logs(**ANALYZE_KWARGS)
+
+        assert result == VALID_LLM_RESPONSE
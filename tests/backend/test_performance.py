@@ -46,8 +46,8 @@ def mock_environment(monkeypatch):
     monkeypatch.setenv("ALLOWED_ORIGINS", "*")
 
     # Reset global config to force reload
-    import config
-    config.config = None
+    from config import get_config
+    get_config.cache_clear()
 
 
 class TestPerformance:
@@ -2,9 +2,11 @@
 Tests for Sentry API Client
 """
 
+import asyncio
+import json
 import os
 import pytest
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from unittest.mock import AsyncMock, patch, MagicMock
 
 import httpx
@@ -13,13 +15,15 @@ from sentry_client import (
     fetch_sentry_events,
     clear_sentry_cache,
     _parse_iso_timestamp,
-    _format_datetime_for_sentry,
     _make_sentry_request,
+    _get_client,
+    _cache_ttl,
+    close_sentry_client,
     SentryAuthError,
     SentryRateLimitError,
     SentryAPIError,
 )
-from config import Config
+from config import Config, get_config
 
 
 @pytest.fixture
@@ -31,6 +35,7 @@ def mock_config():
             "SENTRY_AUTH_TOKEN": "test-token-123",
             "SENTRY_ORG": "test-org",
             "SENTRY_PROJECT": "test-project",
+            "GEMINI_API_KEY": "test-gemini-key",
             "OPENAI_API_KEY": "test-openai-key",
             "SLACK_BOT_TOKEN": "test-slack-token",
             "SLACK_SIGNING_SECRET": "test-slack-secret",
@@ -39,8 +44,8 @@ def mock_config():
         },
     ):
         # Reset global config
-        import config as config_module
-        config_module.config = None
+        from config import get_config
+        get_config.cache_clear()
         yield
 
 
@@ -98,14 +103,6 @@ class TestTimestampParsing:
         with pytest.raises(ValueError):
             _parse_iso_timestamp("")
 
-    def test_format_datetime_for_sentry(self):
-        """Test formatting datetime for Sentry API"""
-        dt = datetime(2025, 1, 19, 14, 30, 0)
-        result = _format_datetime_for_sentry(dt)
-        assert isinstance(result, str)
-        assert "2025-01-19" in result
-        assert "14:30:00" in result
-
 
 class TestMakeSentryRequest:
     """Test HTTP request handling"""
@@ -115,13 +112,11 @@ class TestMakeSentryRequest:
         """Test successful API request"""
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.json.return_value = sample_sentry_events
+        mock_response.content = json.dumps(sample_sentry_events).encode()
         mock_response.raise_for_status = MagicMock()
 
-        with patch("httpx.AsyncClient") as mock_client:
-            mock_client.return_value.__aenter__.return_value.get = AsyncMock(
-                return_value=mock_response
-            )
+        with patch("sentry_client._get_client") as mock_client:
+            mock_client.return_value.get = AsyncMock(return_value=mock_response)
 
             result = await _make_sentry_request(
                 url="https://sentry.io/api/0/test",
@@ -138,10 +133,8 @@ class TestMakeSentryRequest:
         mock_response.status_code = 429
         mock_response.headers = {"Retry-After": "60"}
 
-        with patch("httpx.AsyncClient") as mock_client:
-            mock_client.return_value.__aenter__.return_value.get = AsyncMock(
-                return_value=mock_response
-            )
+        with patch("sentry_client._get_client") as mock_client:
+            mock_client.return_value.get = AsyncMock(return_value=mock_response)
 
             with pytest.raises(SentryRateLimitError, match="Rate limit exceeded"):
                 await _make_sentry_request(
@@ -156,10 +149,8 @@ class TestMakeSentryRequest:
         mock_response = MagicMock()
         mock_response.status_code = 401
 
-        with patch("httpx.AsyncClient") as mock_client:
-            mock_client.return_value.__aenter__.return_value.get = AsyncMock(
-                return_value=mock_response
-            )
+        with patch("sentry_client._get_client") as mock_client:
+            mock_client.return_value.get = AsyncMock(return_value=mock_response)
 
             with pytest.raises(SentryAuthError, match="Invalid or expired"):
                 await _make_sentry_request(
@@ -174,10 +165,8 @@ class TestMakeSentryRequest:
         mock_response = MagicMock()
         mock_response.status_code = 404
 
-        with patch("httpx.AsyncClient") as mock_client:
-            mock_client.return_value.__aenter__.return_value.get = AsyncMock(
-                return_value=mock_response
-            )
+        with patch("sentry_client._get_client") as mock_client:
+            mock_client.return_value.get = AsyncMock(return_value=mock_response)
 
             with pytest.raises(SentryAPIError, match="project not found"):
                 await _make_sentry_request(
@@ -192,10 +181,8 @@ class TestMakeSentryRequest:
         mock_response = MagicMock()
         mock_response.status_code = 500
 
-        with patch("httpx.AsyncClient") as mock_client:
-            mock_client.return_value.__aenter__.return_value.get = AsyncMock(
-                return_value=mock_response
-            )
+        with patch("sentry_client._get_client") as mock_client:
+            mock_client.return_value.get = AsyncMock(return_value=mock_response)
 
             with pytest.raises(SentryAPIError, match="server error"):
                 await _make_sentry_request(
@@ -205,6 +192,65 @@ class TestMakeSentryRequest:
                 )
 
 
+    @pytest.mark.asyncio
+    async def test_connection_errors_are_retried(self, sample_sentry_events):
+        """Test that transient request errors are retried with backoff"""
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.content = json.dumps(sample_sentry_events).encode()
+
+        with patch("sentry_client._get_client") as mock_client, \
+                patch("sentry_client.asyncio.sleep", new=AsyncMock()) as mock_sleep:
+            mock_client.return_value.get = AsyncMock(
+                side_effect=[httpx.ConnectError("refused"), mock_response]
+            )
+
+            result = await _make_sentry_request(url="https://sentry.io/api/0/test", params={})
+
+        assert result == sample_sentry_events
+        mock_sleep.assert_awaited_once()
+        assert 2 <= mock_sleep.call_args[0][0] <= 3
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self):
+        """Test that the last request error is raised once retries are exhausted"""
+        with patch("sentry_client._get_client") as mock_client, \
+                patch("sentry_client.asyncio.sleep", new=AsyncMock()) as mock_sleep:
+            mock_client.return_value.get = AsyncMock(side_effect=httpx.ReadTimeout("slow"))
+
+            with pytest.raises(httpx.ReadTimeout):
+                await _make_sentry_request(url="https://sentry.io/api/0/test", params={})
+
+        assert mock_client.return_value.get.await_count == 3
+        assert mock_sleep.await_count == 2
+
+
+class TestSentryClientReuse:
+    """Test that the Sentry HTTP client is shared across requests"""
+
+    @pytest.mark.asyncio
+    async def test_client_created_once(self, mock_config):
+        """Test that repeated lookups reuse the same pooled client"""
+        await close_sentry_client()
+        try:
+            assert _get_client() is _get_client()
+        finally:
+            await close_sentry_client()
+
+    @pytest.mark.asyncio
+    async def test_client_rebuilt_after_close(self, mock_config):
+        """Test that a closed client is replaced on next use"""
+        first = _get_client()
+        await close_sentry_client()
+
+        second = _get_client()
+        try:
+            assert first.is_closed
+            assert second is not first
+        finally:
+            await close_sentry_client()
+
+
 class TestFetchSentryEvents:
     """Test main fetch_sentry_events function"""
 
@@ -345,6 +391,146 @@ class TestFetchSentryEvents:
             assert events1 == events2
             assert len(events1) == 2
 
+    @pytest.mark.asyncio
+    async def test_cache_evicts_least_recently_used(self, mock_config, sample_sentry_events):
+        """Test that a recently hit entry survives eviction when the cache is full"""
+        clear_sentry_cache()
+
+        mock_request = AsyncMock(return_value=sample_sentry_events)
+
+        async def fetch(customer_id):
+            await fetch_sentry_events(customer_id=customer_id, timestamp="2025-01-19T14:30:00Z")
+
+        with patch("sentry_client._make_sentry_request", new=mock_request), \
+                patch("sentry_client.SENTRY_CACHE_MAX_ENTRIES", 2):
+            await fetch("usr_a")
+            await fetch("usr_b")
+            await fetch("usr_a")  # hit, usr_a becomes most recent
+            await fetch("usr_c")  # evicts usr_b
+            assert mock_request.call_count == 3
+
+            await fetch("usr_a")
+            assert mock_request.call_count == 3
+
+            await fetch("usr_b")
+            assert mock_request.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_refetched(self, mock_config, sample_sentry_events, monkeypatch):
+        """Test that cached events past their TTL are fetched again"""
+        clear_sentry_cache()
+        monkeypatch.setenv("SENTRY_CACHE_TTL_SECONDS", "0")
+
+        mock_request = AsyncMock(return_value=sample_sentry_events)
+
+        with patch("sentry_client._make_sentry_request", new=mock_request):
+            for _ in range(2):
+                await fetch_sentry_events(customer_id="usr_abc123", timestamp="2025-01-19T14:30:00Z")
+
+        assert mock_request.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_fetches_share_one_request(self, mock_config, sample_sentry_events):
+        """Test that identical lookups in flight together make a single Sentry call"""
+        clear_sentry_cache()
+        calls = 0
+
+        async def slow_request(*args, **kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return sample_sentry_events
+
+        with patch("sentry_client._make_sentry_request", new=slow_request):
+            results = await asyncio.gather(*[
+                fetch_sentry_events(customer_id="usr_abc123", timestamp="2025-01-19T14:30:00Z")
+                for _ in range(3)
+            ])
+
+        assert results == [sample_sentry_events] * 3
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_in_flight_failure_reaches_all_callers(self, mock_config):
+        """Test that callers sharing an in-flight fetch all see its error"""
+        clear_sentry_cache()
+
+        async def failing_request(*args, **kwargs):
+            await asyncio.sleep(0.01)
+            raise SentryRateLimitError("Rate limited")
+
+        with patch("sentry_client._make_sentry_request", new=failing_request):
+            results = await asyncio.gather(
+                *[
+                    fetch_sentry_events(customer_id="usr_abc123", timestamp="2025-01-19T14:30:00Z")
+                    for _ in range(2)
+                ],
+                return_exceptions=True,
+            )
+
+        assert all(isinstance(result, SentryRateLimitError) for result in results)
+
+    @pytest.mark.asyncio
+    async def test_cancelled_first_caller_does_not_cancel_others(self, mock_config, sample_sentry_events):
+        """Test that cancelling the caller that started a fetch leaves joined callers running"""
+        clear_sentry_cache()
+        calls = 0
+
+        async def slow_request(*args, **kwargs):
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.02)
+            return sample_sentry_events
+
+        with patch("sentry_client._make_sentry_request", new=slow_request):
+            first = asyncio.create_task(
+                fetch_sentry_events(customer_id="usr_abc123", timestamp="2025-01-19T14:30:00Z")
+            )
+            await asyncio.sleep(0)
+            second = asyncio.create_task(
+                fetch_sentry_events(customer_id="usr_abc123", timestamp="2025-01-19T14:30:00Z")
+            )
+            await asyncio.sleep(0.005)
+            first.cancel()
+
+            assert await second == sample_sentry_events
+
+        assert first.cancelled()
+        assert calls == 1
+
+    @pytest.mark.asyncio
+    async def test_window_batching_serves_nearby_lookups_from_one_query(self, mock_config, monkeypatch):
+        """Test that lookups in the same 30-minute bucket share one query and are sliced"""
+        monkeypatch.setenv("SENTRY_WINDOW_BATCHING_ENABLED", "true")
+        clear_sentry_cache()
+
+        bucket_events = [
+            {"id": "late", "dateCreated": "2025-01-19T14:40:00Z"},
+            {"id": "early", "dateCreated": "2025-01-19T14:21:00Z"},
+            {"id": "middle", "dateCreated": "2025-01-19T14:31:00Z"},
+        ]
+        mock_request = AsyncMock(return_value=bucket_events)
+
+        with patch("sentry_client._make_sentry_request", new=mock_request):
+            first = await fetch_sentry_events(customer_id="usr_abc123", timestamp="2025-01-19T14:30:00Z")
+            second = await fetch_sentry_events(customer_id="usr_abc123", timestamp="2025-01-19T14:35:00Z")
+
+        assert mock_request.call_count == 1
+        params = mock_request.call_args[0][1]
+        assert params["start"].startswith("2025-01-19T14:15:00")
+        assert params["end"].startswith("2025-01-19T15:15:00")
+
+        assert [event["id"] for event in first] == ["middle"]
+        assert [event["id"] for event in second] == ["middle", "late"]
+
+    def test_recent_windows_get_short_ttl(self, mock_config):
+        """Test that windows which may still receive events expire sooner"""
+        recent = datetime.now(timezone.utc) - timedelta(minutes=5)
+        old = datetime.now(timezone.utc) - timedelta(days=2)
+        config = get_config()
+
+        assert _cache_ttl(recent, config) < _cache_ttl(old, config)
+
 
 class TestIntegration:
     """Integration tests for Sentry client"""
@@ -357,7 +543,7 @@ class TestIntegration:
 
         called_url = None
 
-        async def capture_url(url, headers, params, **kwargs):
+        async def capture_url(url, params, **kwargs):
             nonlocal called_url
             called_url = url
             return sample_sentry_events
@@ -378,7 +564,7 @@ class TestIntegration:
 
         called_params = None
 
-        async def capture_params(url, headers, params, **kwargs):
+        async def capture_params(url, params, **kwargs):
             nonlocal called_params
             called_params = params
             return sample_sentry_events
@@ -390,31 +576,36 @@ class TestIntegration:
                 time_window_minutes=5,
             )
 
-            assert called_params["query"] == "user.id:usr_abc123"
-            assert called_params["full"] == "true"
-            assert "start" in called_params
-            assert "end" in called_params
+            # customer_id only scopes the cache and logs; it isn't sent as a filter
+            assert called_params == {
+                "start": "2025-01-19T14:25:00+00:00",
+                "end": "2025-01-19T14:35:00+00:00",
+                "full": "true",
+            }
 
     @pytest.mark.asyncio
-    async def test_authorization_header(self, mock_config, sample_sentry_events):
-        """Test that authorization header is set correctly"""
-        # Clear cache before test
-        clear_sentry_cache()
-
-        called_headers = None
-
-        async def capture_headers(url, headers, params, **kwargs):
-            nonlocal called_headers
-            called_headers = headers
-            return sample_sentry_events
-
-        with patch("sentry_client._make_sentry_request", new=capture_headers):
-            await fetch_sentry_events(
-                customer_id="usr_abc123",
-                timestamp="2025-01-19T14:30:00Z",
-            )
+    async def test_authorization_header(self, mock_config):
+        """Test that the shared client carries the authorization header"""
+        await close_sentry_client()
+        try:
+            assert _get_client().headers["Authorization"] == "Bearer test-token-123"
+        finally:
+            await close_sentry_client()
 
-            assert called_headers["Authorization"] == "Bearer test-token-123"
+    @pytest.mark.asyncio
+    async def test_authorization_header_follows_token_change(self, mock_config, monkeypatch):
+        """Test that a rotated token updates the existing client's header"""
+        await close_sentry_client()
+        try:
+            client = _get_client()
+
+            monkeypatch.setenv("SENTRY_AUTH_TOKEN", "rotated-token")
+            get_config.cache_clear()
+
+            assert _get_client() is client
+            assert client.headers["Authorization"] == "Bearer rotated-token"
+        finally:
+            await close_sentry_client()
 
 
 if __name__ == "__main__":
@@ -18,6 +18,7 @@ from slack_bot import (
     format_slack_response,
     format_slack_error,
     handle_slack_command,
+    post_to_response_url,
     SlackSignatureVerificationError
 )
 
@@ -640,5 +641,48 @@ async def test_handle_slack_command_integration(mock_env):
             assert any(block.get("type") == "header" for block in result["blocks"])
 
 
+# Test 28: Repeated and rotated signing secrets
+def test_signature_verification_with_repeated_and_rotated_secret():
+    """Test that the cached HMAC key is reused safely and follows a secret change"""
+    timestamp = str(int(time.time()))
+
+    for body in (b"text=first", b"text=second"):
+        signature = generate_slack_signature(body.decode('utf-8'), timestamp, "my-secret")
+        verify_slack_signature(body, timestamp, signature, "my-secret")
+
+    body = b"text=rotated"
+    signature = generate_slack_signature(body.decode('utf-8'), timestamp, "new-secret")
+    verify_slack_signature(body, timestamp, signature, "new-secret")
+
+    with pytest.raises(SlackSignatureVerificationError):
+        verify_slack_signature(body, timestamp, signature, "my-secret")
+
+
+# Test 29: Malformed timestamps
+@pytest.mark.parametrize("timestamp", ["not-a-number", "", "nan", "inf"])
+def test_malformed_timestamp_rejection(timestamp):
+    """Test that non-numeric or non-finite timestamps are rejected"""
+    body = b"text=test"
+    signature = generate_slack_signature(body.decode('utf-8'), timestamp, "my-secret")
+
+    with pytest.raises(SlackSignatureVerificationError):
+        verify_slack_signature(body, timestamp, signature, "my-secret")
+
+
+# Test 30: Results are posted through the shared client
+@pytest.mark.asyncio
+async def test_post_to_response_url_uses_shared_client():
+    """Test that background results are posted as JSON via the pooled client"""
+    message = format_slack_error("Something failed")
+
+    with patch("slack_bot._get_http_client") as mock_get_client:
+        mock_get_client.return_value.post = AsyncMock()
+        await post_to_response_url("https://hooks.slack.com/commands/1", message, timeout=10.0)
+
+    mock_get_client.return_value.post.assert_awaited_once_with(
+        "https://hooks.slack.com/commands/1", json=message, timeout=10.0
+    )
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
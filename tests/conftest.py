@@ -7,6 +7,18 @@ This file ensures that the backend module can be imported from tests.
 import sys
 from pathlib import Path
 
+import pytest
+
 # Add backend directory to Python path
 backend_dir = Path(__file__).parent.parent / "backend"
 sys.path.insert(0, str(backend_dir))
+
+from config import get_config  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_config():
+    """Reload config from the environment in every test (get_config is cached)"""
+    get_config.cache_clear()
+    yield
+    get_config.cache_clear()